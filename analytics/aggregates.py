@@ -0,0 +1,286 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from analytics.classification import LEVEL_QUANTILES, LevelClassifier, dense_ranks
+from ingestion.column_cache import cache_dir_for
+from ingestion.country_index import CountryIndex
+from ingestion.load_data import DATA_PATH, iter_global_data, load_global_data
+from instrumentation.timing import timed
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+AGGREGATES_FILE = "aggregates.npz"
+
+ARRAY_FIELDS = (
+    "count", "mean", "m2", "minimum", "maximum",
+    "hourly_sum", "hourly_count", "hourly_min",
+)
+
+
+@timed
+def group_stats(codes, values, hours, n):
+    count = np.bincount(codes, minlength=n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.bincount(codes, weights=values, minlength=n) / count
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=n)
+
+    minimum = np.full(n, np.inf)
+    maximum = np.full(n, -np.inf)
+    np.minimum.at(minimum, codes, values)
+    np.maximum.at(maximum, codes, values)
+
+    slots = codes * 24 + hours
+    hourly_min = np.full(n * 24, np.inf)
+    np.minimum.at(hourly_min, slots, values)
+
+    empty = count == 0
+    mean[empty] = 0.0
+    minimum[empty] = np.nan
+    maximum[empty] = np.nan
+    return {
+        "count": count,
+        "mean": mean,
+        "m2": m2,
+        "minimum": minimum,
+        "maximum": maximum,
+        "hourly_sum": np.bincount(slots, weights=values, minlength=n * 24).reshape(n, 24),
+        "hourly_count": np.bincount(slots, minlength=n * 24).reshape(n, 24),
+        "hourly_min": hourly_min.reshape(n, 24),
+    }
+
+
+class AggregateStore:
+    # per-country statistics and 24-hour profiles, built once per data version
+
+    def __init__(self, countries, count, mean, m2, minimum, maximum,
+                 hourly_sum, hourly_count, hourly_min, data_version=None):
+        self.countries = [str(c) for c in countries]
+        self.positions = {c: i for i, c in enumerate(self.countries)}
+        self.data_version = data_version
+
+        self.count = np.asarray(count, dtype=np.int64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.m2 = np.asarray(m2, dtype=np.float64)
+        self.minimum = np.asarray(minimum, dtype=np.float64)
+        self.maximum = np.asarray(maximum, dtype=np.float64)
+        self.hourly_sum = np.asarray(hourly_sum, dtype=np.float64)
+        self.hourly_count = np.asarray(hourly_count, dtype=np.int64)
+        self.hourly_min = np.asarray(hourly_min, dtype=np.float64)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.std = np.sqrt(self.m2 / (self.count - 1))
+            self.hourly_profile = self.hourly_sum / self.hourly_count
+        self.std[self.count < 2] = np.nan
+
+        # levels and dense ranks for every country, once per data version;
+        # countries without readings share the rank after the last one
+        present = self.count > 0
+        self.classifier = LevelClassifier.from_values(self.mean[present], LEVEL_QUANTILES)
+        self.q_low, self.q_high = self.classifier.thresholds
+        self.levels = self.classifier.classify(self.mean)
+        self.rank = dense_ranks(self.mean, present)
+
+    @classmethod
+    @timed
+    def from_frame(cls, data):
+        if isinstance(data, CountryIndex):
+            data = data.frame
+        data = data[data[INTENSITY].notna() & (data["utc_hour"] >= 0)]
+
+        country = data["country"]
+        if not isinstance(country.dtype, pd.CategoricalDtype):
+            country = country.astype("category")
+        countries = country.cat.categories
+
+        codes = country.cat.codes.to_numpy().astype(np.int64)
+        keep = codes >= 0
+        stats = group_stats(
+            codes[keep],
+            data[INTENSITY].to_numpy(dtype=np.float64)[keep],
+            data["utc_hour"].to_numpy().astype(np.int64)[keep],
+            len(countries),
+        )
+        return cls(countries, data_version=data.attrs.get("data_version"), **stats)
+
+    def save(self, path):
+        np.savez(
+            path,
+            countries=np.array(self.countries),
+            data_version=np.array(self.data_version or ""),
+            **{field: getattr(self, field) for field in ARRAY_FIELDS},
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            arrays = {field: f[field] for field in ARRAY_FIELDS}
+            return cls(
+                f["countries"].tolist(),
+                data_version=str(f["data_version"]) or None,
+                **arrays,
+            )
+
+    def __len__(self):
+        return len(self.countries)
+
+    def __contains__(self, country):
+        return country in self.positions
+
+    def code(self, country):
+        return self.positions.get(country, -1)
+
+    def mean_of(self, country):
+        code = self.code(country)
+        if code < 0 or self.count[code] == 0:
+            return np.nan
+        return float(self.mean[code])
+
+    def rank_of(self, country):
+        code = self.code(country)
+        if code < 0:
+            return None
+        return int(self.rank[code])
+
+    def level_of(self, value):
+        return self.classifier.level_of(value)
+
+    def country_level(self, country):
+        code = self.code(country)
+        if code < 0 or self.count[code] == 0:
+            return None
+        return str(self.levels[code])
+
+    def levels_with(self, bins, labels=None):
+        # the same countries split into any number of equal-share bins
+        present = self.count > 0
+        classifier = LevelClassifier.with_bins(self.mean[present], bins, labels)
+        return classifier.classify(self.mean)
+
+    def low_hours(self, country, threshold=200):
+        code = self.code(country)
+        if code < 0:
+            return []
+        return np.flatnonzero(self.hourly_min[code] < threshold).tolist()
+
+    def summary_frame(self):
+        present = self.count > 0
+        return pd.DataFrame({
+            "country": np.array(self.countries, dtype=object)[present],
+            INTENSITY: self.mean[present],
+            "Level": self.levels[present],
+        })
+
+
+@timed
+def load_aggregates(path=DATA_PATH):
+    df = load_global_data(path)
+    version = df.attrs.get("data_version")
+    store_path = os.path.join(cache_dir_for(path), AGGREGATES_FILE)
+
+    if version is not None and os.path.exists(store_path):
+        store = AggregateStore.load(store_path)
+        if store.data_version == version:
+            return store
+
+    store = AggregateStore.from_frame(df)
+    try:
+        store.save(store_path)
+    except OSError:
+        pass
+    return store
+
+
+class RunningAggregates:
+    # online version of AggregateStore.from_frame: each chunk is reduced on
+    # its own and merged into the running state with Chan/Welford updates,
+    # so memory depends on the number of countries, not on the input size
+
+    def __init__(self):
+        self.countries = []
+        self.positions = {}
+        self.stats = group_stats(
+            np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=np.int64), 0
+        )
+        self.rows = 0
+
+    def _grow(self, n):
+        extra = n - len(self.stats["count"])
+        if extra <= 0:
+            return
+        fill = {
+            "count": 0, "mean": 0.0, "m2": 0.0, "minimum": np.nan,
+            "maximum": np.nan, "hourly_sum": 0.0, "hourly_count": 0,
+            "hourly_min": np.inf,
+        }
+        for field, value in fill.items():
+            current = self.stats[field]
+            pad = np.full((extra,) + current.shape[1:], value, dtype=current.dtype)
+            self.stats[field] = np.concatenate([current, pad])
+
+    def codes_for(self, country):
+        local_codes, uniques = pd.factorize(country)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            name = str(name)
+            code = self.positions.get(name)
+            if code is None:
+                code = len(self.countries)
+                self.positions[name] = code
+                self.countries.append(name)
+            mapping[i] = code
+        self._grow(len(self.countries))
+        return np.where(local_codes >= 0, mapping[local_codes], -1)
+
+    @timed
+    def update(self, chunk):
+        chunk = chunk[chunk[INTENSITY].notna() & (chunk["utc_hour"] >= 0)]
+        codes = self.codes_for(chunk["country"].to_numpy())
+        keep = codes >= 0
+        batch = group_stats(
+            codes[keep],
+            chunk[INTENSITY].to_numpy(dtype=np.float64)[keep],
+            chunk["utc_hour"].to_numpy().astype(np.int64)[keep],
+            len(self.countries),
+        )
+
+        state = self.stats
+        n_a = state["count"].astype(np.float64)
+        n_b = batch["count"].astype(np.float64)
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = batch["mean"] - state["mean"]
+            state["mean"] = np.where(n > 0, state["mean"] + delta * n_b / n, 0.0)
+            state["m2"] = np.where(
+                n > 0, state["m2"] + batch["m2"] + delta ** 2 * n_a * n_b / n, 0.0
+            )
+        state["count"] = state["count"] + batch["count"]
+        state["minimum"] = np.fmin(state["minimum"], batch["minimum"])
+        state["maximum"] = np.fmax(state["maximum"], batch["maximum"])
+        state["hourly_sum"] = state["hourly_sum"] + batch["hourly_sum"]
+        state["hourly_count"] = state["hourly_count"] + batch["hourly_count"]
+        state["hourly_min"] = np.minimum(state["hourly_min"], batch["hourly_min"])
+        self.rows += len(chunk)
+
+    def to_store(self, data_version=None):
+        # countries are numbered by first appearance; the store sorts by name
+        order = np.argsort(np.array(self.countries, dtype=object))
+        return AggregateStore(
+            [self.countries[i] for i in order],
+            data_version=data_version,
+            **{field: values[order] for field, values in self.stats.items()},
+        )
+
+
+@timed
+def stream_aggregates(path=DATA_PATH, chunksize=1_000_000):
+    running = RunningAggregates()
+    version = []
+    chunks = iter_global_data(
+        path, chunksize=chunksize,
+        usecols=["country", "utc_hour", INTENSITY],
+        on_done=version.append,
+    )
+    for chunk in chunks:
+        running.update(chunk)
+    return running.to_store(data_version=version[0][:12] if version else None)
@@ -1,2 +1,6 @@
+from instrumentation.timing import timed
+
+
+@timed
 def calculate_emission(carbon_intensity, energy_kwh):
     return carbon_intensity * energy_kwh
@@ -0,0 +1,74 @@
+import numpy as np
+
+from instrumentation.timing import timed
+
+LEVEL_QUANTILES = (0.33, 0.66)
+LEVEL_LABELS = ("Low", "Moderate", "High")
+
+
+def bin_labels(bins):
+    if bins == len(LEVEL_LABELS):
+        return LEVEL_LABELS
+    return tuple(f"Level {i}" for i in range(1, bins + 1))
+
+
+def even_quantiles(bins):
+    # bins - 1 cut points splitting the distribution into equal shares
+    return tuple(np.linspace(0, 1, bins + 1)[1:-1])
+
+
+@timed
+def dense_ranks(values, valid=None):
+    # 1 = lowest value, equal values share a rank; invalid entries (no
+    # readings) all get the rank after the last valid one
+    values = np.asarray(values, dtype=np.float64)
+    if valid is None:
+        valid = ~np.isnan(values)
+    ranks = np.empty(len(values), dtype=np.int64)
+    unique, inverse = np.unique(values[valid], return_inverse=True)
+    ranks[valid] = inverse + 1
+    ranks[~valid] = len(unique) + 1
+    return ranks
+
+
+class LevelClassifier:
+    # value -> level by binary search over sorted thresholds; a value equal
+    # to a threshold belongs to the higher level
+
+    def __init__(self, thresholds, labels=None):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.labels = np.asarray(
+            labels if labels is not None else bin_labels(len(self.thresholds) + 1),
+            dtype=object,
+        )
+        if len(self.labels) != len(self.thresholds) + 1:
+            raise ValueError("need one more label than thresholds")
+
+    @classmethod
+    def from_values(cls, values, quantiles=LEVEL_QUANTILES, labels=None):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            thresholds = np.quantile(values, quantiles)
+        else:
+            thresholds = np.full(len(quantiles), np.nan)
+        return cls(thresholds, labels)
+
+    @classmethod
+    def with_bins(cls, values, bins, labels=None):
+        return cls.from_values(values, even_quantiles(bins), labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def codes(self, values):
+        # missing values fall in the lowest level
+        codes = np.searchsorted(self.thresholds, values, side="right")
+        return np.where(np.isnan(values), 0, codes)
+
+    @timed
+    def classify(self, values):
+        return self.labels[self.codes(values)]
+
+    def level_of(self, value):
+        return self.labels[int(self.codes(value))]
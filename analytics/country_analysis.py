@@ -1,3 +1,11 @@
-def average_country_intensity(df, country):
-    country_df = df[df["country"] == country]
-    return country_df["carbon_intensity_gCO2_per_kWh"].mean()
+from analytics.aggregates import AggregateStore
+from ingestion.country_index import country_rows
+from instrumentation.timing import timed
+
+
+@timed
+def average_country_intensity(df, country):
+    if isinstance(df, AggregateStore):
+        return df.mean_of(country)
+    country_df = country_rows(df, country)
+    return country_df["carbon_intensity_gCO2_per_kWh"].mean()
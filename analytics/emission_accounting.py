@@ -0,0 +1,222 @@
+import argparse
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.carbon_metrics import calculate_emission
+from ingestion.load_data import DATA_PATH, load_global_data
+from instrumentation.timing import timed
+from modeling.forecast import hourly_cube
+
+# execution-log columns
+TASK_ID = "task_id"
+COUNTRY = "country"
+START = "start"
+DURATION = "duration_h"
+ENERGY = "energy_kwh"
+LOG_COLUMNS = [TASK_ID, COUNTRY, START, DURATION, ENERGY]
+
+NS_PER_HOUR = 3_600_000_000_000
+
+
+def _nanmean(values, axis):
+    # all-NaN rows give NaN without a warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=axis)
+
+
+class IntensityGrid:
+    # (countries x hours) intensity on a contiguous hourly axis plus its
+    # prefix sums, so the integral of intensity over any [start, end) span
+    # is two lookups per task. Missing hours take the country's average for
+    # that hour of day, then the country's overall average.
+
+    def __init__(self, countries, intensity, start):
+        self.countries = [str(c) for c in countries]
+        self.index = pd.Index(self.countries)
+        self.start = np.datetime64(start, "ns")
+        intensity = np.asarray(intensity, dtype=np.float64)
+        if not intensity.shape[1]:
+            raise ValueError("no hourly intensity readings")
+
+        self.mean = _nanmean(intensity, axis=1)
+        self.values = intensity.copy()
+        self._fill_missing()
+
+        self.hours = self.values.shape[1]
+        self.cumulative = np.zeros((len(self.countries), self.hours + 1))
+        np.cumsum(self.values, axis=1, out=self.cumulative[:, 1:])
+
+    def _fill_missing(self):
+        missing = np.isnan(self.values)
+        if not missing.any():
+            return
+        hours = self.values.shape[1]
+        padded = np.full((len(self.countries), -(-hours // 24) * 24), np.nan)
+        padded[:, :hours] = self.values
+        profile = _nanmean(padded.reshape(len(self.countries), -1, 24), axis=1)
+        profile = np.where(np.isnan(profile), self.mean[:, None], profile)
+        hour_of_day = (np.arange(hours) + self.start.astype("datetime64[h]").astype(np.int64)) % 24
+        self.values = np.where(missing, profile[:, hour_of_day], self.values)
+
+    @classmethod
+    def from_data(cls, data):
+        countries, cube, start = hourly_cube(data)
+        return cls(countries, cube.reshape(len(countries), -1), start)
+
+    @classmethod
+    def from_arrays(cls, countries, start, values, mean, cumulative):
+        # a grid over already filled arrays (e.g. memory-mapped), as built
+        # by __init__
+        grid = cls.__new__(cls)
+        grid.countries = [str(c) for c in countries]
+        grid.index = pd.Index(grid.countries)
+        grid.start = np.datetime64(start, "ns")
+        grid.values = values
+        grid.mean = mean
+        grid.hours = values.shape[1]
+        grid.cumulative = cumulative
+        return grid
+
+    def codes(self, countries):
+        return self.index.get_indexer(countries).astype(np.int64)
+
+    def integral(self, codes, t0, t1):
+        # integral of intensity (g/kWh x hours) over [t0, t1] in grid hours,
+        # both already clipped to [0, hours]
+        def at(t):
+            hour = np.minimum(np.floor(t).astype(np.int64), self.hours - 1)
+            return self.cumulative[codes, hour] + (t - hour) * self.values[codes, hour]
+        return at(t1) - at(t0)
+
+
+@timed
+def account_tasks(log, grid):
+    # per-task gCO2: `actual` spreads each task's energy evenly over the
+    # hours it ran and bills every hour at that hour's intensity (hours
+    # outside the grid at the country average); `counterfactual` is the
+    # country-average estimate calculate_emission gives today
+    codes = grid.codes(log[COUNTRY].to_numpy())
+    start = pd.to_datetime(log[START]).to_numpy().astype("datetime64[ns]")
+    duration = log[DURATION].to_numpy(dtype=np.float64)
+    energy = log[ENERGY].to_numpy(dtype=np.float64)
+
+    known = (codes >= 0) & ~np.isnat(start) & (duration >= 0)
+    safe = np.where(known, codes, 0)
+    mean = np.where(known, grid.mean[safe], np.nan)
+
+    t0 = (start - grid.start).astype(np.int64) / NS_PER_HOUR
+    t1 = t0 + duration
+    in0 = np.clip(t0, 0, grid.hours)
+    in1 = np.clip(t1, 0, grid.hours)
+    covered = in1 - in0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inside = grid.integral(safe, in0, in1)
+        rate = (inside + (duration - covered) * mean) / duration
+        coverage = np.where(duration > 0, covered / duration, 0.0)
+
+    # zero-length tasks draw their energy at the intensity of their start hour
+    instant = known & (duration == 0)
+    if instant.any():
+        hour = np.floor(t0[instant]).astype(np.int64)
+        within = (hour >= 0) & (hour < grid.hours)
+        at_start = grid.values[safe[instant], np.clip(hour, 0, grid.hours - 1)]
+        rate[instant] = np.where(within, at_start, mean[instant])
+        coverage[instant] = within
+
+    actual = np.where(known, calculate_emission(rate, energy), np.nan)
+    counterfactual = calculate_emission(mean, energy)
+    return pd.DataFrame({
+        TASK_ID: log[TASK_ID].to_numpy(),
+        COUNTRY: log[COUNTRY].to_numpy(),
+        ENERGY: energy,
+        "actual_g": actual,
+        "counterfactual_g": counterfactual,
+        "difference_g": counterfactual - actual,
+        "coverage": np.where(known, coverage, 0.0),
+    })
+
+
+class CountryTotals:
+    # running per-country sums over any number of accounted chunks
+
+    FIELDS = (ENERGY, "actual_g", "counterfactual_g")
+
+    def __init__(self, countries):
+        self.countries = list(countries)
+        self.tasks = np.zeros(len(self.countries), dtype=np.int64)
+        self.sums = {field: np.zeros(len(self.countries)) for field in self.FIELDS}
+        self.unmatched = 0
+
+    def add(self, per_task, codes):
+        known = (codes >= 0) & ~np.isnan(per_task["actual_g"].to_numpy())
+        self.unmatched += int((~known).sum())
+        n = len(self.countries)
+        self.tasks += np.bincount(codes[known], minlength=n)
+        for field in self.FIELDS:
+            values = per_task[field].to_numpy()[known]
+            self.sums[field] += np.bincount(codes[known], weights=values, minlength=n)
+
+    def frame(self):
+        present = self.tasks > 0
+        totals = pd.DataFrame({
+            COUNTRY: np.array(self.countries, dtype=object)[present],
+            "tasks": self.tasks[present],
+            **{field: values[present] for field, values in self.sums.items()},
+        })
+        totals["difference_g"] = totals["counterfactual_g"] - totals["actual_g"]
+        return totals
+
+
+def country_totals(per_task, grid):
+    totals = CountryTotals(grid.countries)
+    totals.add(per_task, grid.codes(per_task[COUNTRY].to_numpy()))
+    return totals.frame()
+
+
+@timed
+def account_log(path, grid, out=None, chunksize=1_000_000):
+    # streams a CSV execution log of any size; per-task rows are appended to
+    # `out` (if given) chunk by chunk and per-country totals are returned
+    totals = CountryTotals(grid.countries)
+    header = True
+    for chunk in pd.read_csv(path, usecols=LOG_COLUMNS, chunksize=chunksize,
+                             dtype={COUNTRY: "category"}):
+        per_task = account_tasks(chunk, grid)
+        totals.add(per_task, grid.codes(chunk[COUNTRY].to_numpy()))
+        if out is not None:
+            per_task.to_csv(out, mode="w" if header else "a", header=header, index=False)
+            header = False
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bill task executions with hourly carbon intensity")
+    parser.add_argument("log", help=f"execution log CSV with columns {', '.join(LOG_COLUMNS)}")
+    parser.add_argument("--data", default=DATA_PATH, help="hourly intensity dataset")
+    parser.add_argument("--out", help="per-task results CSV")
+    parser.add_argument("--totals", help="per-country totals CSV (default: print)")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    grid = IntensityGrid.from_data(load_global_data(args.data))
+    totals = account_log(args.log, grid, args.out, args.chunksize)
+    frame = totals.frame()
+    if args.totals:
+        frame.to_csv(args.totals, index=False)
+    else:
+        print(frame.to_string(index=False))
+    if totals.unmatched:
+        print(f"{totals.unmatched:,} tasks with unknown country or invalid start/duration",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from ingestion.country_index import CountryIndex
+from instrumentation.timing import timed
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+MIN_SLACK = 24
+
+
+class TrendEngine:
+    # per-country prefix sums of intensity (and of position * intensity) over
+    # the time-sorted readings, so the mean or slope of any trailing window is
+    # O(1) per country and vectorized across all countries. Each country owns
+    # a segment of one flat array with spare room for appended hours.
+    # Missing (NaN) readings add nothing to the sums and are not counted, so
+    # a window's mean skips them like pandas' mean does; positions for the
+    # slope are counted over the readings that are present.
+
+    def __init__(self, countries, values, offsets):
+        self.countries = [str(c) for c in countries]
+        self.positions = {c: i for i, c in enumerate(self.countries)}
+        values = np.asarray(values, dtype=np.float64)
+        lengths = np.diff(np.asarray(offsets, dtype=np.int64))
+        self._layout(lengths)
+
+        codes = np.repeat(np.arange(len(lengths)), lengths)
+        k = np.arange(len(values)) - np.repeat(offsets[:-1] - offsets[0], lengths)
+        self._write(codes, k, values)
+        self.length = lengths.copy()
+
+    @classmethod
+    @timed
+    def from_data(cls, data):
+        if not isinstance(data, CountryIndex):
+            data = CountryIndex(data)
+        values = data.frame[INTENSITY].to_numpy(dtype=np.float64)[data.offsets[0]:]
+        return cls(data.countries, values, data.offsets)
+
+    @classmethod
+    def from_state(cls, countries, start, capacity, length, cs, csk, cn):
+        # an engine over existing prefix-sum arrays (e.g. memory-mapped);
+        # read-only arrays support every query but not append
+        engine = cls.__new__(cls)
+        engine.countries = [str(c) for c in countries]
+        engine.positions = {c: i for i, c in enumerate(engine.countries)}
+        engine.start = start
+        engine.capacity = capacity
+        engine.length = length
+        engine.cs = cs
+        engine.csk = csk
+        engine.cn = cn
+        return engine
+
+    def _layout(self, lengths, old=None):
+        # segment c: slot 0 holds 0, slot k holds the sum of the first k values
+        capacity = lengths + np.maximum(lengths // 8, MIN_SLACK)
+        start = np.zeros(len(lengths), dtype=np.int64)
+        np.cumsum(capacity[:-1] + 1, out=start[1:])
+        cs = np.zeros(int((capacity + 1).sum()))
+        csk = np.zeros_like(cs)
+        cn = np.zeros(len(cs), dtype=np.int64)
+        if old is not None:
+            old_start, old_length, old_cs, old_csk, old_cn = old
+            for c in range(len(old_start)):
+                used = slice(old_start[c], old_start[c] + old_length[c] + 1)
+                cs[start[c]:start[c] + old_length[c] + 1] = old_cs[used]
+                csk[start[c]:start[c] + old_length[c] + 1] = old_csk[used]
+                cn[start[c]:start[c] + old_length[c] + 1] = old_cn[used]
+        self.start = start
+        self.capacity = capacity
+        self.cs = cs
+        self.csk = csk
+        self.cn = cn
+
+    def _write(self, codes, k, values):
+        # codes grouped by country, k = position of each value in its country
+        if not len(values):
+            return
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        group_start = np.flatnonzero(first)
+        group_len = np.diff(np.append(group_start, len(codes)))
+
+        def running_sums(x):
+            # cumulative sums of x within each country's group
+            total = np.cumsum(x)
+            before = np.concatenate([[0], total])[group_start]
+            return total - np.repeat(before, group_len)
+
+        slots = self.start[codes] + k
+        present = ~np.isnan(values)
+        values = np.where(present, values, 0.0)
+        count = np.repeat(self.cn[slots[group_start]], group_len) + running_sums(present)
+        # position of each present reading among the country's present readings
+        position = count - 1
+
+        base = np.repeat(self.cs[slots[group_start]], group_len)
+        base_k = np.repeat(self.csk[slots[group_start]], group_len)
+        self.cs[slots + 1] = base + running_sums(values)
+        self.csk[slots + 1] = base_k + running_sums(position * values)
+        self.cn[slots + 1] = count
+
+    @timed
+    def append(self, countries, values):
+        # newly arrived readings, in time order within each country
+        countries = np.asarray(countries, dtype=object)
+        values = np.asarray(values, dtype=np.float64)
+        for name in pd.unique(countries):
+            if name not in self.positions:
+                self.positions[str(name)] = len(self.countries)
+                self.countries.append(str(name))
+
+        codes = np.array([self.positions[str(c)] for c in countries], dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        codes, values = codes[order], values[order]
+
+        n = len(self.countries)
+        added = np.bincount(codes, minlength=n)
+        length = np.zeros(n, dtype=np.int64)
+        length[:len(self.length)] = self.length
+        capacity = np.zeros(n, dtype=np.int64)
+        capacity[:len(self.capacity)] = self.capacity
+        if (length + added > capacity).any():
+            old = (self.start, self.length, self.cs, self.csk, self.cn)
+            self._layout(length + added, old)
+
+        first = np.searchsorted(codes, codes)
+        k = length[codes] + np.arange(len(codes)) - first
+        self._write(codes, k, values)
+        self.length = length + added
+
+    def _window(self, n, codes=slice(None)):
+        length = self.length[codes]
+        m = np.minimum(n, length)
+        end = self.start[codes] + length
+        return m, end - m, end, length
+
+    def window_means(self, n, codes=slice(None)):
+        # NaN where the window holds no present reading
+        _, begin, end, _ = self._window(n, codes)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self.cs[end] - self.cs[begin]) / (self.cn[end] - self.cn[begin])
+
+    def window_slopes(self, n, codes=slice(None)):
+        # least-squares slope (gCO2/kWh per reading) over the present
+        # readings among the last n, which sit at positions a..b
+        _, begin, end, _ = self._window(n, codes)
+        m = self.cn[end] - self.cn[begin]
+        a = self.cn[begin].astype(np.float64)
+        b = (self.cn[end] - 1).astype(np.float64)
+        sy = self.cs[end] - self.cs[begin]
+        sxy = self.csk[end] - self.csk[begin]
+        sx = m * (a + b) / 2
+        sxx = (b * (b + 1) * (2 * b + 1) - (a - 1) * a * (2 * a - 1)) / 6
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (m * sxy - sx * sy) / (m * sxx - sx ** 2)
+
+    def window_mean(self, country, n):
+        code = self.positions.get(country, -1)
+        if code < 0:
+            return np.nan
+        return float(self.window_means(n, code))
+
+    def window_slope(self, country, n):
+        code = self.positions.get(country, -1)
+        if code < 0:
+            return np.nan
+        return float(self.window_slopes(n, code))
+
+    def is_increasing(self, short=7, long=30, codes=slice(None)):
+        return self.window_means(short, codes) > self.window_means(long, codes)
+
+    def trend_status(self, country, short=7, long=30):
+        code = self.positions.get(country, -1)
+        if code >= 0 and self.is_increasing(short, long, code):
+            return "Increasing"
+        return "Decreasing"
+
+    @timed
+    def worsening(self, short=7, long=30):
+        # countries whose short-window mean is above their long-window mean,
+        # largest increase first
+        change = self.window_means(short) - self.window_means(long)
+        rising = np.flatnonzero(change > 0)
+        rising = rising[np.argsort(-change[rising], kind="stable")]
+        return pd.DataFrame({
+            "country": np.array(self.countries, dtype=object)[rising],
+            "change": change[rising],
+        })
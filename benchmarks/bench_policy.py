@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scheduling.policy_engine import DECISIONS, LowHourPlan, apply_policy, schedule_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="apply_policy vs schedule_batch throughput")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--countries", type=int, default=195)
+    parser.add_argument("--scalar-sample", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    countries = [f"region_{i}" for i in range(args.countries)]
+    plan = LowHourPlan(countries, rng.random((args.countries, 24)) < 0.4)
+
+    codes = rng.integers(0, args.countries, args.tasks)
+    hours = rng.integers(0, 24, args.tasks)
+
+    start = time.perf_counter()
+    decisions, targets = schedule_batch(plan, codes, hours)
+    batch_seconds = time.perf_counter() - start
+
+    # scalar path, fed the same per-country hour lists the old code used
+    low_hours = [plan.low_hours(c) for c in countries]
+    sample = min(args.scalar_sample, args.tasks)
+    start = time.perf_counter()
+    scalar = [apply_policy(int(hours[i]), low_hours[codes[i]]) for i in range(sample)]
+    scalar_seconds = time.perf_counter() - start
+
+    if list(DECISIONS[decisions[:sample]]) != scalar:
+        raise SystemExit("schedule_batch disagrees with apply_policy")
+
+    batch_rate = args.tasks / batch_seconds
+    scalar_rate = sample / scalar_seconds
+    print(f"schedule_batch: {args.tasks:,} tasks in {batch_seconds:.4f}s ({batch_rate:,.0f} tasks/s)")
+    print(f"apply_policy:   {sample:,} tasks in {scalar_seconds:.4f}s ({scalar_rate:,.0f} tasks/s)")
+    print(f"speedup: {batch_rate / scalar_rate:,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.aggregates import AggregateStore
+from analytics.country_analysis import average_country_intensity
+from analytics.emission_accounting import IntensityGrid, account_tasks
+from analytics.trend_engine import TrendEngine
+from benchmarks.synthetic import write_synthetic
+from ingestion.column_cache import cache_dir_for
+from ingestion.country_index import CountryIndex
+from ingestion.load_data import load_global_data
+from modeling.prediction_engine import predict_low_carbon_hours
+from modeling.whatif import simulate
+from reporting.summary_report import generate_report
+from scheduling.policy_engine import LowHourPlan, apply_policy, schedule_batch
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+REGRESSION_RATIO = 1.2
+
+BENCHMARKS = []
+
+
+def benchmark(name, units):
+    # registers fn(ctx) -> number of `units` processed per run
+    def register(fn):
+        BENCHMARKS.append((name, units, fn))
+        return fn
+    return register
+
+
+class Context:
+    def __init__(self, path, lookups, seed=0):
+        self.path = path
+        self.df = load_global_data(path)
+        self.index = CountryIndex(self.df)
+        self.store = AggregateStore.from_frame(self.index)
+        self.trends = TrendEngine.from_data(self.index)
+        rng = np.random.default_rng(seed)
+        self.sample = list(rng.choice(self.store.countries, min(lookups, len(self.store))))
+        self.rng = rng
+
+
+@benchmark("load_global_data.csv", "rows")
+def bench_load_csv(ctx):
+    return len(load_global_data(ctx.path, use_cache=False))
+
+
+@benchmark("load_global_data.cold_cache", "rows")
+def bench_load_cold(ctx):
+    shutil.rmtree(cache_dir_for(ctx.path), ignore_errors=True)
+    return len(load_global_data(ctx.path))
+
+
+@benchmark("load_global_data.warm_cache", "rows")
+def bench_load_warm(ctx):
+    return len(load_global_data(ctx.path))
+
+
+@benchmark("average_country_intensity.frame", "calls")
+def bench_average_frame(ctx):
+    for country in ctx.sample:
+        average_country_intensity(ctx.df, country)
+    return len(ctx.sample)
+
+
+@benchmark("average_country_intensity.index", "calls")
+def bench_average_index(ctx):
+    for country in ctx.sample:
+        average_country_intensity(ctx.index, country)
+    return len(ctx.sample)
+
+
+@benchmark("average_country_intensity.store", "calls")
+def bench_average_store(ctx):
+    for country in ctx.sample:
+        average_country_intensity(ctx.store, country)
+    return len(ctx.sample)
+
+
+@benchmark("predict_low_carbon_hours.frame", "calls")
+def bench_low_hours_frame(ctx):
+    for country in ctx.sample:
+        predict_low_carbon_hours(ctx.df, country)
+    return len(ctx.sample)
+
+
+@benchmark("predict_low_carbon_hours.store", "calls")
+def bench_low_hours_store(ctx):
+    for country in ctx.sample:
+        predict_low_carbon_hours(ctx.store, country)
+    return len(ctx.sample)
+
+
+@benchmark("apply_policy", "calls")
+def bench_apply_policy(ctx):
+    low_hours = ctx.store.low_hours(ctx.sample[0])
+    for hour in range(100_000):
+        apply_policy(hour % 24, low_hours)
+    return 100_000
+
+
+@benchmark("schedule_batch", "tasks")
+def bench_schedule_batch(ctx):
+    plan = LowHourPlan.from_store(ctx.store)
+    n = 1_000_000
+    schedule_batch(plan, ctx.rng.integers(0, len(plan.countries), n), ctx.rng.integers(0, 24, n))
+    return n
+
+
+@benchmark("generate_report", "calls")
+def bench_generate_report(ctx):
+    for i in range(100_000):
+        generate_report("bench", 100.0 + i, 60.0)
+    return 100_000
+
+
+@benchmark("emission_accounting", "tasks")
+def bench_emission_accounting(ctx):
+    grid = IntensityGrid.from_data(ctx.index)
+    n = 1_000_000
+    countries = np.array(grid.countries)
+    log = pd.DataFrame({
+        "task_id": np.arange(n),
+        "country": countries[ctx.rng.integers(0, len(countries), n)],
+        "start": grid.start + (ctx.rng.uniform(0, grid.hours, n) * 3600).astype("timedelta64[s]"),
+        "duration_h": ctx.rng.exponential(3.0, n),
+        "energy_kwh": ctx.rng.uniform(0.1, 50.0, n),
+    })
+    account_tasks(log, grid)
+    return n
+
+
+@benchmark("whatif.simulate", "tasks")
+def bench_whatif(ctx):
+    grid = IntensityGrid.from_data(ctx.index)
+    for country in ctx.sample[:20]:
+        simulate(grid, country, "profile", tasks=10_000)
+    return 20 * 10_000
+
+
+@benchmark("dashboard.country_index", "rows")
+def bench_country_index(ctx):
+    return len(CountryIndex(ctx.df))
+
+
+@benchmark("dashboard.aggregates", "rows")
+def bench_aggregates(ctx):
+    AggregateStore.from_frame(ctx.index)
+    return len(ctx.index)
+
+
+@benchmark("dashboard.trend_engine", "rows")
+def bench_trend_engine(ctx):
+    TrendEngine.from_data(ctx.index)
+    return len(ctx.index)
+
+
+@benchmark("dashboard.trend_frame", "calls")
+def bench_trend_frame(ctx):
+    for country in ctx.sample:
+        rows = ctx.index.slice(country)["carbon_intensity_gCO2_per_kWh"]
+        rows.tail(7).mean() > rows.tail(30).mean()
+    return len(ctx.sample)
+
+
+@benchmark("dashboard.trend_window", "calls")
+def bench_trend_window(ctx):
+    for country in ctx.sample:
+        ctx.trends.trend_status(country, 7, 30)
+    return len(ctx.sample)
+
+
+@benchmark("dashboard.summary_table", "calls")
+def bench_summary_table(ctx):
+    for _ in range(100):
+        ctx.store.summary_frame()
+    return 100
+
+
+@benchmark("dashboard.pdf", "reports")
+def bench_pdf(ctx):
+    try:
+        from reporting.pdf_report import build_country_pdf
+    except ImportError:
+        return None
+    country = ctx.sample[0]
+    mean = ctx.store.mean_of(country)
+    report = {
+        "country": country, "rank": ctx.store.rank_of(country),
+        "n_countries": len(ctx.store), "green_score": 50.0,
+        "reduction_percentage": 40.0, "best_hour": 3,
+        "normal_emission": mean * 0.5, "green_emission": mean * 0.3,
+        "saved": mean * 0.2, "carbon_cost": 0.1, "avg_7_day": mean,
+        "avg_30_day": mean, "avg_intensity": mean,
+        "level": ctx.store.level_of(mean), "recommendation": "bench",
+    }
+    for _ in range(10):
+        build_country_pdf(report)
+    return 10
+
+
+def run_one(fn, ctx, repeat):
+    times = []
+    units = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units = fn(ctx)
+        times.append(time.perf_counter() - start)
+        if units is None:
+            return None
+
+    # separate traced run: tracemalloc slows the code it observes
+    tracemalloc.start()
+    fn(ctx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = float(np.median(times))
+    return {
+        "seconds": median,
+        "best_seconds": float(min(times)),
+        "units": units,
+        "throughput": units / median if median else float("inf"),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def git_label():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def compare(results, baseline_path, rows, regions):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if (baseline["rows"], baseline["regions"]) != (rows, regions):
+        print(f"warning: baseline ran on {baseline['rows']:,} rows / "
+              f"{baseline['regions']:,} regions; timings are not comparable")
+    baseline = baseline["results"]
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["seconds"] / baseline[name]["seconds"]
+        flag = "  REGRESSION" if ratio > REGRESSION_RATIO else ""
+        print(f"{name:38} {ratio:6.2f}x vs baseline{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GreenCode benchmark suite")
+    parser.add_argument("--data", help="existing dataset CSV (default: generate one)")
+    parser.add_argument("--rows", type=int, default=195 * 30 * 24)
+    parser.add_argument("--regions", type=int, default=195)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--only", help="comma-separated benchmark name prefixes")
+    parser.add_argument("--label", default=None, help="results name (default: git revision)")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    workdir = None
+    path = args.data
+    if path is None:
+        workdir = tempfile.mkdtemp(prefix="greencode-bench-")
+        path = os.path.join(workdir, "synthetic.csv")
+        start = time.perf_counter()
+        write_synthetic(path, args.rows, args.regions)
+        print(f"generated {args.rows:,} rows / {args.regions:,} regions "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    try:
+        ctx = Context(path, args.lookups)
+        selected = BENCHMARKS
+        if args.only:
+            prefixes = tuple(args.only.split(","))
+            selected = [b for b in BENCHMARKS if b[0].startswith(prefixes)]
+
+        results = {}
+        for name, units, fn in selected:
+            result = run_one(fn, ctx, args.repeat)
+            if result is None:
+                print(f"{name:38} skipped")
+                continue
+            results[name] = dict(result, unit=units)
+            print(
+                f"{name:38} {result['seconds'] * 1000:10.2f} ms "
+                f"{result['throughput']:14,.0f} {units}/s "
+                f"peak {result['peak_mb']:8.1f} MB"
+            )
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    label = args.label or git_label()
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"{label}.json")
+    with open(out_path, "w") as f:
+        json.dump({
+            "label": label,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "rows": len(ctx.df),
+            "regions": len(ctx.store),
+            "results": results,
+        }, f, indent=2)
+    print(f"results written to {out_path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, len(ctx.df), len(ctx.store))
+        if regressions and args.fail_on_regression:
+            raise SystemExit(f"{len(regressions)} benchmark(s) regressed")
+
+
+if __name__ == "__main__":
+    main()
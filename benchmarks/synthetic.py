@@ -0,0 +1,72 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+START = np.datetime64("2024-01-01T00", "h")
+
+
+def region_names(regions):
+    return [f"Region{i:05d}" for i in range(regions)]
+
+
+def iter_synthetic(rows, regions=195, seed=0, chunk_rows=1_000_000):
+    # hourly readings for `regions` regions with a per-region base level,
+    # a diurnal cycle and noise; yields frames in the dataset schema, one
+    # block of whole hours at a time so memory stays bounded
+    rng = np.random.default_rng(seed)
+    names = np.array(region_names(regions), dtype=object)
+    base = rng.uniform(30, 900, regions)
+    amplitude = rng.uniform(0.05, 0.4, regions)
+    phase = rng.integers(0, 24, regions)
+
+    hours_total = -(-rows // regions)
+    hours_per_chunk = max(1, chunk_rows // regions)
+    written = 0
+    for first in range(0, hours_total, hours_per_chunk):
+        hours = np.arange(first, min(first + hours_per_chunk, hours_total))
+        stamps = START + hours
+        utc_hour = (hours % 24).astype(np.int8)
+
+        cycle = np.sin(2 * np.pi * (utc_hour[:, None] - phase[None, :]) / 24)
+        values = base * (1 + amplitude * cycle)
+        values += rng.normal(0, 0.05, values.shape) * base
+        values = np.clip(values, 0, None).round(2)
+
+        take = min(values.size, rows - written)
+        frame = pd.DataFrame({
+            "country": np.tile(names, len(hours))[:take],
+            "timestamp": np.repeat(stamps, regions)[:take],
+            "utc_hour": np.repeat(utc_hour, regions)[:take],
+            INTENSITY: values.ravel()[:take],
+        })
+        written += take
+        yield frame
+
+
+def write_synthetic(path, rows, regions=195, seed=0, chunk_rows=1_000_000):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    header = True
+    for frame in iter_synthetic(rows, regions, seed, chunk_rows):
+        frame.to_csv(
+            path, mode="w" if header else "a", header=header, index=False,
+            date_format="%Y-%m-%d %H:%M:%S",
+        )
+        header = False
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="write a synthetic intensity dataset")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=195 * 30 * 24)
+    parser.add_argument("--regions", type=int, default=195)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic(args.path, args.rows, args.regions, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+# most points a line chart sends to the browser
+CHART_POINTS = 500
+FIGURE_CACHE_SIZE = 32
+
+LEVEL_COLORS = {"High": "red", "Moderate": "orange", "Low": "green"}
+
+
+def lttb(x, y, points):
+    # largest-triangle-three-buckets: indices of `points` samples keeping the
+    # visual shape (peaks and troughs) of the series; first/last always kept
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(series, points=CHART_POINTS):
+    # series for st.line_chart, reduced with LTTB when longer than `points`;
+    # the index is the x axis when it is sorted, otherwise the position
+    series = series.dropna()
+    if len(series) <= points:
+        return series
+    index = series.index
+    if isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing:
+        x = index.asi8
+    elif pd.api.types.is_numeric_dtype(index) and index.is_monotonic_increasing:
+        x = index.to_numpy()
+    else:
+        x = np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), points)]
+
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def cached_figure(key, build):
+    # figure built once per key (which includes the data version) and kept in
+    # a bounded LRU shared by all sessions; st.plotly_chart only reads it
+    # (to_dict copies), and a Figure skips the validation a dict would get
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    figure = build()
+
+    with _cache_lock:
+        _cache[key] = figure
+        _cache.move_to_end(key)
+        while len(_cache) > FIGURE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return figure
+
+
+def choropleth_figure(summary, data_version):
+    return cached_figure(("choropleth", data_version), lambda: px.choropleth(
+        summary,
+        locations="country",
+        locationmode="country names",
+        color="Level",
+        color_discrete_map=LEVEL_COLORS,
+    ))
+
+
+def comparison_figure(country_x, avg_x, country_y, avg_y, data_version):
+    def build():
+        if avg_x < avg_y:
+            colors_map = {country_x: "green", country_y: "red"}
+        else:
+            colors_map = {country_x: "red", country_y: "green"}
+        compare_df = pd.DataFrame({
+            "Country": [country_x, country_y],
+            "Carbon Intensity (gCO₂/kWh)": [avg_x, avg_y],
+        })
+        fig = px.bar(
+            compare_df,
+            x="Country",
+            y="Carbon Intensity (gCO₂/kWh)",
+            color="Country",
+            color_discrete_map=colors_map,
+            text_auto=".2f",
+        )
+        fig.update_layout(
+            yaxis_title="Carbon Intensity (gCO₂/kWh)",
+            xaxis_title="Country",
+            showlegend=False,
+        )
+        return fig
+
+    return cached_figure(("comparison", data_version, country_x, country_y), build)
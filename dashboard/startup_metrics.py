@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+METRICS_PATH = os.environ.get(
+    "GREENCODE_STARTUP_METRICS", os.path.join("data", ".metrics", "startup.jsonl")
+)
+
+
+def record_first_render(seconds, mode, cold, path=METRICS_PATH):
+    entry = {
+        "time": time.time(),
+        "first_render_s": round(seconds, 4),
+        "mode": mode,
+        "cold": bool(cold),
+    }
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+    return entry
+
+
+def load_first_renders(path=METRICS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def first_render_summary(path=METRICS_PATH):
+    summary = {}
+    for entry in load_first_renders(path):
+        key = f"{entry['mode']}/{'cold' if entry['cold'] else 'warm'}"
+        summary.setdefault(key, []).append(entry["first_render_s"])
+    return {
+        key: {
+            "renders": len(values),
+            "p50_s": float(np.percentile(values, 50)),
+            "p95_s": float(np.percentile(values, 95)),
+            "last_s": values[-1],
+        }
+        for key, values in summary.items()
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH
+    for key, stats in first_render_summary(path).items():
+        print(
+            f"{key:16} renders={stats['renders']:<5} p50={stats['p50_s']:.3f}s "
+            f"p95={stats['p95_s']:.3f}s last={stats['last_s']:.3f}s"
+        )
@@ -1,31 +1,57 @@
+import time
+
+SCRIPT_START = time.perf_counter()
+
 import sys
 import os
-from io import BytesIO
+from contextlib import nullcontext
 
 # ---- FIX PROJECT PATH ----
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import time
-import base64
 
+# debug mode also times the data pipeline; the switch is read when the
+# pipeline modules are first imported, so it is set before them
+if os.environ.get("GREENCODE_DEBUG", "") == "1":
+    os.environ.setdefault("GREENCODE_TIMING", "1")
 
-
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-from reportlab.platypus import TableStyle
-
-from ingestion.load_data import load_global_data
+# plotly, reportlab and the data pipeline are imported inside the sections
+# and loaders that use them, so the first render does not wait on them
 from analytics.carbon_metrics import calculate_emission
 from analytics.country_analysis import average_country_intensity
+from modeling.prediction_engine import forecast_low_carbon_hours
+from modeling.whatif import MAX_BUDGET, country_simulation, green_reduction
+from modeling.window_search import forecast_windows
+from dashboard.startup_metrics import record_first_render
+from instrumentation.timing import (
+    ENABLED as TIMING_ENABLED, REGISTRY, SectionTimer, save_profile, start_profile,
+)
 
 ENERGY_PER_TASK = 0.5
 CARBON_PRICE_PER_KG = 1.5
 
+# production: no splash screen or artificial waits (kiosks, restarts)
+PRODUCTION_MODE = os.environ.get("GREENCODE_MODE", "").lower() == "production"
+# debug: extra diagnostics panels at the bottom of the page
+DEBUG_MODE = os.environ.get("GREENCODE_DEBUG", "") == "1"
+# live: CSV file, directory or tcp://host:port to tail for new readings
+LIVE_SOURCE = os.environ.get("GREENCODE_LIVE", "")
+LIVE_REFRESH_SECONDS = 5
+# shared: GREENCODE_SHARED=1 (or a directory) reads the dataset published by
+# `python -m ingestion.shared_dataset publish`, memory-mapped once for every
+# server process and worker; newer published versions are picked up on rerun
+SHARED_ROOT = os.environ.get("GREENCODE_SHARED", "")
+# profile: GREENCODE_PROFILE=1 (every rerun) or ?profile=1 (reruns of that page)
+# runs the script under cProfile and saves the stats in data/.metrics
+PROFILE_RUN = (
+    os.environ.get("GREENCODE_PROFILE", "") == "1" or st.query_params.get("profile") == "1"
+)
+
+profiler = start_profile() if PROFILE_RUN else None
+# per-section wall time of this rerun, aggregated per process
+sections = SectionTimer("dashboard.", enabled=TIMING_ENABLED)
+
 
 def splash_screen():
     BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -111,64 +137,197 @@ def splash_screen():
     st.markdown(splash_html, unsafe_allow_html=True)
     time.sleep(3)
 
-if "splash_done" not in st.session_state:
+if not PRODUCTION_MODE and "splash_done" not in st.session_state:
     splash_screen()
     st.session_state.splash_done = True
     st.rerun()
 
 
 # ---------------- LOAD DATA ----------------
-@st.cache_data
+# longest trend window the dashboard shows
+DATA_WINDOW_DAYS = 30
+
+# shared per process (cache_resource): cache_data would hand every session
+# its own unpickled copy of the frame
+@st.cache_resource
 def load_data():
-    df = load_global_data()
-    df["country_lower"] = df["country"].str.lower()
-    df["timestamp"] = pd.to_datetime(df["timestamp"])  # ✅ FIX
+    from ingestion.load_data import DATA_PATH, load_global_data
+    from ingestion.partitions import has_partitions, load_window
+    from ingestion.validate_data import drop_invalid, report_path, validation_report
+
+    # with a time-partitioned dataset only the displayed window is read;
+    # timestamps come back already parsed from the columnar cache
+    if has_partitions():
+        df = load_window(DATA_WINDOW_DAYS)
+        report = validation_report(df)
+    else:
+        df = load_global_data()
+        report = validation_report(df, report_path(DATA_PATH))
+    # rows failing validation are left out, and the report says how many
+    if report["invalid_rows"]:
+        df = drop_invalid(df)
     return df
 
-df = load_data()
-df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-df = df.dropna(subset=["timestamp"])
+@st.cache_resource
+def load_validation():
+    from ingestion.validate_data import validation_report
+
+    # already computed by load_data for this data version
+    return validation_report(load_data())
+
+@st.cache_resource
+def load_index():
+    from ingestion.country_index import CountryIndex
+
+    # built once per process; per-country slices are views into it
+    return CountryIndex(load_data())
+
+@st.cache_resource
+def load_store():
+    from analytics.aggregates import AggregateStore
+
+    # means, quantiles, ranks and hourly profiles for every country
+    return AggregateStore.from_frame(load_index())
+
+@st.cache_resource
+def load_forecast():
+    from modeling.forecast import ForecastEngine
+
+    # next-24h forecast for every country in one pass
+    return ForecastEngine.from_data(load_index())
+
+@st.cache_resource
+def load_trends():
+    from analytics.trend_engine import TrendEngine
+
+    # prefix sums per country: any trailing-window mean is O(1)
+    return TrendEngine.from_data(load_index())
+
+@st.cache_resource
+def load_grid():
+    from analytics.emission_accounting import IntensityGrid
+
+    # contiguous hourly history the what-if simulations replay
+    return IntensityGrid.from_data(load_index())
+
+@st.cache_resource
+def load_shared():
+    from ingestion.shared_dataset import SHARED_DIR, SharedDataset, publish
+
+    # the first process to start publishes if nothing has been yet
+    root = SHARED_DIR if SHARED_ROOT == "1" else SHARED_ROOT
+    return SharedDataset.open(root) or publish(load_data(), root, load_validation())
 
-countries = sorted(df["country"].unique())
+@st.cache_resource(max_entries=2)
+def load_shared_forecast(_index, counter):
+    from modeling.forecast import ForecastEngine
+
+    # one forecast per published version (the index argument is not hashed)
+    return ForecastEngine.from_data(_index)
+
+@st.cache_resource
+def load_live():
+    from ingestion.live_feed import LiveDataset, LiveFeed, open_source
+
+    # one feed per server process; every session reads the same dataset
+    base = load_shared().refresh().index if SHARED_ROOT else load_index()
+    return LiveFeed(LiveDataset(base), open_source(LIVE_SOURCE)).start()
+
+@st.cache_resource
+def process_started():
+    # first call per server process; later sessions are warm starts
+    return time.time()
+
+cold_start = time.time() - process_started() < 1.0
 
 # ---------------- PAGE SETUP ----------------
 st.set_page_config(page_title="GreenCode Global Dashboard", layout="wide")
 
-#----standard look----------
-with st.spinner("🌱 GreenCode is initializing carbon data..."):
-    time.sleep(2)
+if not PRODUCTION_MODE:
+    #----standard look----------
+    with st.spinner("🌱 GreenCode is initializing carbon data..."):
+        time.sleep(2)
 
 ##proffesional look in website##--------------
-progress = st.progress(0)
-
-for i in range(100):
-    time.sleep(0.02)
-    progress.progress(i + 1)
-
+# the bar tracks the real loading steps (instant once they are cached)
+progress = st.progress(0, text="🌱 Loading carbon data...")
+if SHARED_ROOT:
+    # one published version for the whole rerun, even if a newer one lands
+    published = load_shared().refresh()
+    index = published.index
+else:
+    load_data()
+    progress.progress(25, text="🌱 Indexing countries...")
+    index = load_index()
+if LIVE_SOURCE:
+    # aggregates, trends and forecast are updated in place by the feed
+    progress.progress(50, text="🌱 Connecting the live feed...")
+    live = load_live().dataset
+    store = live.store
+    forecast_engine = live.forecast
+    trends = live.trends
+    data_lock = live.lock
+elif SHARED_ROOT:
+    store = published.store
+    progress.progress(60, text="🌱 Forecasting the next 24 hours...")
+    forecast_engine = load_shared_forecast(index, published.counter)
+    trends = published.trends
+    data_lock = nullcontext()
+else:
+    progress.progress(50, text="🌱 Aggregating carbon statistics...")
+    store = load_store()
+    progress.progress(60, text="🌱 Forecasting the next 24 hours...")
+    forecast_engine = load_forecast()
+    progress.progress(80, text="🌱 Computing carbon trends...")
+    trends = load_trends()
+    data_lock = nullcontext()
+progress.progress(90, text="🌱 Preparing the what-if simulator...")
+grid = published.grid if SHARED_ROOT else load_grid()
+progress.progress(100)
 progress.empty()
 
+# the per-country slices, history and best hour come from `index`; a
+# country that so far only appears in the live feed is not offered
+countries = [c for c, n in zip(store.countries, store.count) if n > 0 and c in index]
+
 st.title("🌍 GreenCode – Global Carbon Pollution Analyzer")
 st.write("AI-based system to analyze, compare, and reduce carbon pollution globally")
+
+validation = published.validation if SHARED_ROOT else load_validation()
+if validation and not validation["ok"]:
+    from ingestion.validate_data import summarize
+
+    if validation["invalid_rows"]:
+        st.warning(
+            f"⚠️ Data validation: {validation['invalid_rows']:,} of {validation['rows']:,} "
+            "rows failed checks and are excluded"
+        )
+    else:
+        st.warning("⚠️ Data validation found gaps or duplicate readings")
+    with st.expander("Validation report"):
+        for line in summarize(validation):
+            st.write(f"- {line}")
 st.markdown("---")
 
+if "first_render_recorded" not in st.session_state:
+    record_first_render(
+        time.perf_counter() - SCRIPT_START,
+        mode="production" if PRODUCTION_MODE else "demo",
+        cold=cold_start,
+    )
+    st.session_state.first_render_recorded = True
+
+sections.lap("load")
+
 # =========================================================
 # 🌍 LIVE GLOBAL CARBON STATUS
 # =========================================================
 st.header("🌍 Live Global Carbon Pollution Status")
 
-global_avg = df.groupby("country")["carbon_intensity_gCO2_per_kWh"].mean().reset_index()
-
-q_low = global_avg["carbon_intensity_gCO2_per_kWh"].quantile(0.33)
-q_high = global_avg["carbon_intensity_gCO2_per_kWh"].quantile(0.66)
+global_avg = store.summary_frame()
 
-def classify_level(value):
-    if value >= q_high:
-        return "High"
-    elif value >= q_low:
-        return "Moderate"
-    return "Low"
-
-global_avg["Level"] = global_avg["carbon_intensity_gCO2_per_kWh"].apply(classify_level)
+q_low = store.q_low
+q_high = store.q_high
 
 col1, col2, col3 = st.columns(3)
 
@@ -217,46 +376,43 @@ low_df.index.name = "Sl.No"
 
 col3.dataframe(low_df)
 
+sections.lap("global_status")
+
 # 🌍 World Map
-fig = px.choropleth(
-    global_avg,
-    locations="country",
-    locationmode="country names",
-    color="Level",
-    color_discrete_map={"High":"red","Moderate":"orange","Low":"green"}
-)
-st.plotly_chart(fig, use_container_width=True)
+# figures are cached per data version; long series are downsampled
+from dashboard.charts import choropleth_figure, comparison_figure, downsample
+
+st.plotly_chart(choropleth_figure(global_avg, store.data_version), use_container_width=True)
 
 st.markdown("---")
 
+sections.lap("choropleth")
+
 # =========================================================
 # 🔎 COUNTRY ANALYSIS
 # =========================================================
 country = st.selectbox("Search & select country:", countries)
 
-avg_intensity = average_country_intensity(df, country)
+avg_intensity = average_country_intensity(store, country)
 normal_emission = calculate_emission(avg_intensity, ENERGY_PER_TASK)
-green_emission = normal_emission * 0.6
+# green: tasks wait up to a day for the country's typically cheapest hour,
+# simulated against its hourly history
+green_emission = normal_emission * (1 - green_reduction(grid, country, index.data_version))
 saved = normal_emission - green_emission
 
 green_score = max(0, 100 - avg_intensity / 4)
 carbon_cost = (saved / 1000) * CARBON_PRICE_PER_KG
 reduction_percentage = (saved / normal_emission) * 100
-country_level = classify_level(avg_intensity)
+country_level = store.country_level(country)
 
 
 
 
 # ================= TREND CALCULATION =================
-trend_data = df[df["country"] == country].sort_values("timestamp")
-
-avg_7_day = trend_data.tail(7)["carbon_intensity_gCO2_per_kWh"].mean()
-avg_30_day = trend_data.tail(30)["carbon_intensity_gCO2_per_kWh"].mean()
-
-if avg_7_day > avg_30_day:
-    trend_status = "Increasing"
-else:
-    trend_status = "Decreasing"
+with data_lock:
+    avg_7_day = trends.window_mean(country, 7)
+    avg_30_day = trends.window_mean(country, 30)
+    trend_status = trends.trend_status(country, 7, 30)
 
 # 🚦 Indicator
 if country_level == "High":
@@ -275,7 +431,44 @@ st.metric("🌱 Green Score", f"{green_score:.1f}/100")
 st.metric("📉 Reduction (%)", f"{reduction_percentage:.2f}%")
 st.write(f"💰 Cost Saved: ₹{carbon_cost:.2f}")
 
+sections.lap("country_analysis")
+
+# 📡 LIVE FEED: reruns on its own every few seconds; the rest of the page
+# picks up new readings on the next interaction
+if LIVE_SOURCE:
+    @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+    def live_panel(country):
+        with data_lock:
+            version = live.data_version
+            latest = live.trends.window_mean(country, 1)
+            recent = live.trends.window_mean(country, 7)
+            average = live.store.mean_of(country)
+            low_hours = live.store.low_hours(country)
+            changed = country in live.changed
+            rows, rejected, updated_at = live.rows, live.rejected, live.updated_at
+
+        st.subheader("📡 Live Carbon Feed")
+        col_a, col_b, col_c = st.columns(3)
+        col_a.metric("Latest Reading", f"{latest:.2f} gCO₂/kWh")
+        col_b.metric("Last 7 Readings", f"{recent:.2f} gCO₂/kWh")
+        col_c.metric("Overall Average", f"{average:.2f} gCO₂/kWh")
+        st.write(
+            "🟢 Low-carbon hours (UTC): "
+            + (", ".join(f"{h}:00" for h in low_hours) or "none")
+        )
+        st.caption(
+            f"Data version {version} · {rows:,} live readings · {rejected:,} rejected · "
+            f"updated {time.strftime('%H:%M:%S', time.localtime(updated_at))}"
+        )
+        if changed and st.session_state.get("live_seen") != version:
+            st.toast(f"📡 New readings for {country}")
+        st.session_state.live_seen = version
+
+    live_panel(country)
+
 st.markdown("---")
+sections.lap("live_panel")
+
 st.header("📉 Carbon Pollution Trend")
 
 trend_option = st.radio(
@@ -289,20 +482,12 @@ trend_days = 7 if "Week" in trend_option else 30
 
 
 
-trend_data = (
-    df[df["country"] == country]
-    .sort_values("timestamp")
-    .tail(trend_days * 24)
-)
+trend_data = index.slice(country).tail(trend_days * 24)
 
-daily_trend = (
-    trend_data
-    .groupby(trend_data["timestamp"].dt.date)
-    ["carbon_intensity_gCO2_per_kWh"]
-    .mean()
-)
+# hourly readings over the period, reduced to the chart's point budget
+trend_series = trend_data.set_index("timestamp")["carbon_intensity_gCO2_per_kWh"]
 
-st.line_chart(daily_trend)
+st.line_chart(downsample(trend_series))
 
 st.subheader("🟢 Green Time Recommendation")
 
@@ -313,37 +498,74 @@ elif avg_intensity <= q_high:
 else:
     st.error("⛔ Avoid execution – high carbon period")
 
+sections.lap("trend")
+
+st.subheader("🔮 Next 24 Hours Forecast")
 
+with data_lock:
+    country_forecast = forecast_engine.country_forecast(country)
+    forecast_low = forecast_low_carbon_hours(forecast_engine, country)
+
+st.line_chart(country_forecast)
+
+if forecast_low:
+    st.success(
+        "✅ Forecast low-carbon hours (UTC): "
+        + ", ".join(f"{h}:00" for h in forecast_low)
+    )
+else:
+    st.info("ℹ️ No low-carbon hour forecast in the next 24 hours")
+
+
+
+sections.lap("forecast")
 
 # =========================================================
 # 📈 HOUR-WISE CARBON ANALYSIS (FIX FOR best_hour)
 # =========================================================
-selected_day = (
-    df[df["country"] == country]
-    .sort_values("timestamp")
-    .tail(24)
-)
+selected_day = index.slice(country).tail(24)
 # 📊 TREND CALCULATION (UP / DOWN)
-trend_start = selected_day["carbon_intensity_gCO2_per_kWh"].iloc[0]
-trend_end = selected_day["carbon_intensity_gCO2_per_kWh"].iloc[-1]
-
-trend_change = trend_end - trend_start
+if selected_day.empty:
+    trend_change = 0.0
+else:
+    trend_start = selected_day["carbon_intensity_gCO2_per_kWh"].iloc[0]
+    trend_end = selected_day["carbon_intensity_gCO2_per_kWh"].iloc[-1]
+    trend_change = trend_end - trend_start
 
 
 if not selected_day.empty:
-    best_hour = selected_day.loc[
-        selected_day["carbon_intensity_gCO2_per_kWh"].idxmin()
-    ]["utc_hour"]
-
     st.markdown("---")
     st.header("📈 Hour-wise Carbon Pollution")
     st.line_chart(
         selected_day.set_index("utc_hour")["carbon_intensity_gCO2_per_kWh"]
     )
-    
-    st.success(f"✅ Best Hour to Run Task: {int(best_hour)}:00")
+
+# best start for a job of `task_duration` hours that must finish within
+# `task_deadline` hours, from the forecast (lowest mean over the whole run)
+w1, w2 = st.columns(2)
+with w1:
+    task_duration = st.number_input("Task duration (hours):", 1, 24, 1)
+with w2:
+    task_deadline = st.slider("Finish within (hours):", 1, 48, 24)
+
+with data_lock:
+    window = forecast_windows(
+        forecast_engine, int(task_duration), int(task_deadline), countries=[country]
+    ).iloc[0]
+
+if window["start_offset"] >= 0:
+    best_hour = int(window["start_hour"])
+    st.success(
+        f"✅ Best Time to Run Task: {best_hour}:00–{int(window['end_hour'])}:00 UTC "
+        f"(avg {window['mean_intensity']:.2f} gCO₂/kWh, "
+        f"starts in {int(window['start_offset'])} h)"
+    )
+elif task_duration > task_deadline:
+    best_hour = "N/A"
+    st.warning("⚠️ The task cannot finish within the chosen deadline")
 else:
     best_hour = "N/A"
+    st.info("ℹ️ No forecast available for this country")
     # 🚨 AUTO TREND ALERT
 if trend_change > 0:
     st.error("🚨 ALERT: Carbon pollution trend is increasing")
@@ -351,22 +573,30 @@ else:
     st.success("✅ Carbon pollution trend is stable or decreasing")
 
 st.markdown("---")
-st.header("📊 Carbon Pollution Trend ")
+sections.lap("hourly")
 
-trend_data = df[df["country"] == country].sort_values("timestamp")
-
-last_7 = trend_data.tail(7)["carbon_intensity_gCO2_per_kWh"].mean()
-last_30 = trend_data.tail(30)["carbon_intensity_gCO2_per_kWh"].mean()
+st.header("📊 Carbon Pollution Trend ")
 
-st.metric("📅 Weekly Average", f"{last_7:.2f} gCO₂/kWh")
-st.metric("🗓️ Monthly Average", f"{last_30:.2f} gCO₂/kWh")
+st.metric("📅 Weekly Average", f"{avg_7_day:.2f} gCO₂/kWh")
+st.metric("🗓️ Monthly Average", f"{avg_30_day:.2f} gCO₂/kWh")
 
-if last_7 > last_30:
+if trend_status == "Increasing":
     st.error("🚨 Carbon trend is worsening in the last 7 days")
 else:
     st.success("✅ Carbon trend is improving")
 
+with data_lock:
+    worsening = trends.worsening(7, 30)
+st.caption(f"🌍 {len(worsening)} of {len(countries)} countries are worsening")
+if not worsening.empty:
+    st.dataframe(
+        worsening.head(10).rename(columns={"change": "7 vs 30 change (gCO₂/kWh)"}),
+        hide_index=True,
+    )
+
 st.markdown("---")
+sections.lap("trend_summary")
+
 st.header("🏭 National Carbon Savings (GreenCode Simulation)")
 
 TOTAL_TASKS_PER_DAY = 1_000_000  # simulated national tasks
@@ -385,14 +615,15 @@ st.info(
 # =========================================================
 # 🌍 GLOBAL RANK
 # =========================================================
-rank_df = global_avg.sort_values("carbon_intensity_gCO2_per_kWh").reset_index(drop=True)
-rank = rank_df[rank_df["country"] == country].index[0] + 1
-st.write(f"🌍 Global Rank: {rank}/{len(rank_df)}")
+rank = store.rank_of(country)
+st.write(f"🌍 Global Rank: {rank}/{len(countries)}")
 
 #  =========================================================
 # # ⚖️ COUNTRY COMPARISON
 # # =========================================================
 
+sections.lap("national_savings")
+
 st.header("⚖️ Country Comparison (X vs Y)")
 
 c1, c2 = st.columns(2)
@@ -402,8 +633,8 @@ with c2:
     country_y = st.selectbox("Country Y", countries, index=1)
 
 if st.button("Compare Countries"):
-    avg_x = average_country_intensity(df, country_x)
-    avg_y = average_country_intensity(df, country_y)
+    avg_x = average_country_intensity(store, country_x)
+    avg_y = average_country_intensity(store, country_y)
 
     emission_x = calculate_emission(avg_x, ENERGY_PER_TASK)
     emission_y = calculate_emission(avg_y, ENERGY_PER_TASK)
@@ -451,34 +682,13 @@ if st.button("Compare Countries"):
 
     # Decide colors
     if avg_x < avg_y:
-        colors_map = {country_x: "green", country_y: "red"}
         best_country = country_x
         reason = f"{country_x} has lower carbon intensity than {country_y}."
     else:
-        colors_map = {country_x: "red", country_y: "green"}
         best_country = country_y
         reason = f"{country_y} has lower carbon intensity than {country_x}."
 
-    compare_df = pd.DataFrame({
-        "Country": [country_x, country_y],
-        "Carbon Intensity (gCO₂/kWh)": [avg_x, avg_y]
-    })
-
-    fig = px.bar(
-        compare_df,
-        x="Country",
-        y="Carbon Intensity (gCO₂/kWh)",
-        color="Country",
-        color_discrete_map=colors_map,
-        text_auto=".2f"
-    )
-
-    fig.update_layout(
-        yaxis_title="Carbon Intensity (gCO₂/kWh)",
-        xaxis_title="Country",
-        showlegend=False
-    )
-
+    fig = comparison_figure(country_x, avg_x, country_y, avg_y, store.data_version)
     st.plotly_chart(fig, use_container_width=True)
 
     # ✅ Explanation
@@ -492,8 +702,8 @@ if st.button("Compare Countries"):
     st.write(f"**{country_x} Carbon Intensity:** {avg_x:.2f} gCO₂/kWh")
     st.write(f"**{country_y} Carbon Intensity:** {avg_y:.2f} gCO₂/kWh")
 
-    level_x = classify_level(avg_x)
-    level_y = classify_level(avg_y)
+    level_x = store.country_level(country_x)
+    level_y = store.country_level(country_y)
 
     st.write(f"**{country_x} Carbon Level:** {level_x}")
     st.write(f"**{country_y} Carbon Level:** {level_y}")
@@ -528,6 +738,8 @@ if st.button("Compare Countries"):
 
 
 
+sections.lap("comparison")
+
 # =========================================================
 # 🔁 RECOMMENDATION
 # =========================================================
@@ -552,12 +764,36 @@ st.session_state.prev_level = country_level
 st.markdown("---")
 st.header("🧪 What-If Carbon Simulation")
 
-delay_hours = st.slider("Delay task by hours:", 0, 6, 2)
+# Monte Carlo task arrivals replayed against the hourly history; every
+# budget is simulated at once and cached, so the slider only looks it up
+WHAT_IF_POLICIES = {
+    "Cheapest hour on an average day": "profile",
+    "First low-carbon hour": "threshold",
+    "Best possible (hindsight)": "oracle",
+}
+
+w1, w2 = st.columns(2)
+with w1:
+    delay_hours = st.slider("Delay task by hours:", 0, MAX_BUDGET, 2)
+with w2:
+    policy_label = st.selectbox("Delay policy:", list(WHAT_IF_POLICIES))
 
-simulated_emission = normal_emission * (1 - delay_hours * 0.05)
+simulation = country_simulation(
+    grid, country, index.data_version, WHAT_IF_POLICIES[policy_label]
+)
+outcomes = simulation.summary(ENERGY_PER_TASK).set_index("budget_h")
+outcome = outcomes.loc[delay_hours]
+simulated_emission = normal_emission * (1 - outcome["reduction_pct"] / 100)
 
 st.write(f"📉 Simulated Emission: {simulated_emission:.2f} gCO₂")
 st.write(f"🌱 Extra Carbon Saved: {(normal_emission - simulated_emission):.2f} gCO₂")
+st.caption(
+    f"Per task over {len(simulation.baseline):,} simulated arrivals: "
+    f"median {outcome['saved_p50_g']:.2f} gCO₂ saved, 80% between "
+    f"{outcome['saved_p10_g']:.2f} and {outcome['saved_p90_g']:.2f} gCO₂; "
+    f"{outcome['delayed_pct']:.0f}% of tasks delayed"
+)
+st.line_chart(outcomes["reduction_pct"].rename("Reduction (%) by delay budget (h)"))
 
 st.markdown("---")
 st.header("🏭 National-Scale Carbon Savings")
@@ -573,6 +809,8 @@ st.metric("🌍 Daily CO₂ Saved (g)", f"{daily_savings:,.0f}")
 st.metric("🌍 Yearly CO₂ Saved (kg)", f"{yearly_savings:,.2f}")
 
 st.markdown("---")
+sections.lap("what_if")
+
 st.header("📋 Country Carbon Health Scorecard")
 
 if avg_intensity <= q_low:
@@ -589,135 +827,54 @@ st.metric("Carbon Grade", grade)
 st.write(f"📌 Assessment: {remark}")
 
 
+sections.lap("grade")
+
 # =========================================================
 # 📄 PDF REPORT (YOUR ORIGINAL STRATEGY – FIXED)
 # =========================================================
 
-def generate_pdf():
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
+report_inputs = {
+    "country": country,
+    "rank": rank,
+    "n_countries": len(countries),
+    "green_score": green_score,
+    "reduction_percentage": reduction_percentage,
+    "best_hour": best_hour,
+    "normal_emission": normal_emission,
+    "green_emission": green_emission,
+    "saved": saved,
+    "carbon_cost": carbon_cost,
+    "avg_7_day": avg_7_day,
+    "avg_30_day": avg_30_day,
+    "avg_intensity": avg_intensity,
+    "level": country_level,
+    "recommendation": get_dynamic_recommendation(avg_intensity),
+}
+
+# the PDF is only built once someone asks for it; reruns (slider moves etc.)
+# reuse the cached bytes instead of rebuilding the document
+report_request = (country, store.data_version)
+
+if st.button("📄 Prepare PDF Report"):
+    st.session_state.pdf_request = report_request
 
-    styles = getSampleStyleSheet()
-    elements = []
+if st.session_state.get("pdf_request") == report_request:
+    from reporting.pdf_report import country_pdf
 
-    # ---------------- TITLE ----------------
-    elements.append(
-        Paragraph("<b>GreenCode – Global Carbon Pollution Analysis Report</b>", styles["Title"])
+    st.download_button(
+        "⬇️ Download PDF Report",
+        country_pdf(report_inputs, store.data_version),
+        file_name=f"{country}_carbon_report.pdf",
+        mime="application/pdf"
     )
-    elements.append(Spacer(1, 20))
-
-    # ---------------- EXECUTIVE SUMMARY ----------------
-    elements.append(Paragraph("<b>1. Executive Summary</b>", styles["Heading2"]))
-    elements.append(Spacer(1, 10))
-
-    summary_table = Table([
-        ["Metric", "Value"],
-        ["Country", country],
-        ["Global Rank", f"{rank} / {len(rank_df)}"],
-        ["Green Score", f"{green_score:.1f} / 100"],
-        ["Carbon Reduction (%)", f"{reduction_percentage:.2f}%"],
-        ["Best Execution Hour", f"{best_hour}:00"]
-    ], colWidths=[200, 250])
-
-    summary_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold")
-    ]))
-
-    elements.append(summary_table)
-    elements.append(Spacer(1, 20))
-
-    # ---------------- EMISSION ANALYSIS ----------------
-    elements.append(Paragraph("<b>2. Carbon Emission Analysis</b>", styles["Heading2"]))
-    elements.append(Spacer(1, 10))
-
-    emission_table = Table([
-        ["Type", "Value (gCO2)"],
-        ["Normal Execution", f"{normal_emission:.2f} "],
-        ["GreenCode Execution", f"{green_emission:.2f} "],
-        ["Carbon Saved", f"{saved:.2f} "],
-        ["Estimated Cost Saved", f"{carbon_cost:.2f}"]
-    ], colWidths=[200, 250])
-
-    emission_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold")
-    ]))
-
-    elements.append(emission_table)
-    elements.append(Spacer(1, 20))
-
-    # ---------------- TREND ANALYSIS ----------------
-    trend_status = "Increasing" if avg_7_day > avg_30_day else "Decreasing / Stable"
-
-    elements.append(Paragraph("<b>3. Carbon Trend Analysis</b>", styles["Heading2"]))
-    elements.append(Spacer(1, 10))
-
-    trend_table = Table([
-        ["Period", "Avg Carbon Intensity"],
-        ["Last 7 Days", f"{avg_7_day:.2f} gCO2/kWh"],
-        ["Last 30 Days", f"{avg_30_day:.2f} gCO2/kWh"],
-        ["Trend Status", trend_status]
-    ], colWidths=[200, 250])
-
-    trend_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold")
-    ]))
-
-    elements.append(trend_table)
-    elements.append(Spacer(1, 20))
-
-    # ---------------- SUSTAINABILITY IMPACT ----------------
-    impact_level = country_level
-    elements.append(Paragraph("<b>4. Sustainability Impact</b>", styles["Heading2"]))
-
-    impact_table = Table([
-         ["Indicator", "Assessment"],
-        ["Carbon Intensity", f"{avg_intensity:.2f} gCO2/kWh"],
-        ["Impact Level", impact_level],
-        ["Recommendation", get_dynamic_recommendation(avg_intensity)]
-    ], colWidths=[200, 250])
-
-    impact_table.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-        ("GRID", (0, 0), (-1, -1), 1, colors.black),
-        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold")
-    ]))
-
-    elements.append(impact_table)
-
-    # ---------------- BUILD PDF ----------------
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-st.download_button(
-    "⬇️ Download PDF Report",
-    generate_pdf(),
-    file_name=f"{country}_carbon_report.pdf",
-    mime="application/pdf"
-)
 st.markdown("---")
 
 
+sections.lap("pdf")
+
 scorecard_data = [
     (1, "Carbon Level", country_level),
-    (2, "Global Rank", f"{rank} / {len(rank_df)}"),
+    (2, "Global Rank", f"{rank} / {len(countries)}"),
     (3, "Trend Status", trend_status),
     (4, "Best Execution Time", f"{int(best_hour)}:00" if best_hour != "N/A" else "N/A"),
     (5, "Recommendation", get_dynamic_recommendation(avg_intensity)),
@@ -758,3 +915,35 @@ st.markdown("""
     f"<tr><td>{row[0]}</td><td>{row[1]}</td><td>{row[2]}</td></tr>"
     for row in scorecard_data
 ]) + "</table>", unsafe_allow_html=True)
+
+sections.lap("scorecard")
+
+if DEBUG_MODE:
+    from ingestion.memory_report import format_bytes, memory_report, memory_totals
+
+    with st.expander("🧮 Memory usage"):
+        report = memory_report({
+            "data": index.frame if SHARED_ROOT else load_data(),
+            "index": index,
+            "store": store,
+            "forecast": forecast_engine,
+        })
+        totals = memory_totals(report)
+        for row in totals.itertuples():
+            st.write(
+                f"**{row.object}**: {format_bytes(row.bytes)} "
+                f"({format_bytes(row.resident_bytes)} not memory-mapped)"
+            )
+        st.dataframe(report)
+
+    with st.expander("⏱️ Section and function timings"):
+        st.caption("Wall time per dashboard section and per pipeline call, this server process")
+        st.dataframe(REGISTRY.summary(), hide_index=True)
+
+if TIMING_ENABLED:
+    REGISTRY.export()
+
+if profiler is not None:
+    profile_path = save_profile(profiler, "dashboard")
+    if profile_path and DEBUG_MODE:
+        st.caption(f"cProfile output saved to {profile_path}")
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from instrumentation.timing import timed
+
+CACHE_FORMAT = 2
+MANIFEST = "manifest.json"
+
+COUNTRY = "country"
+TIMESTAMP = "timestamp"
+HOUR = "utc_hour"
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+
+# utc_hour value for blank, non-numeric or out-of-range hours; validation
+# reports these rows as utc_hour mismatches and drop_invalid removes them
+MISSING_HOUR = -1
+
+# column name -> file name inside the cache directory
+COLUMN_FILES = {
+    COUNTRY: "country_codes.npy",
+    TIMESTAMP: "timestamp.npy",
+    HOUR: "utc_hour.npy",
+    INTENSITY: "intensity.npy",
+}
+
+
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class HashingReader:
+    # file wrapper that hashes bytes as a parser pulls them, so a streaming
+    # read can report the data version without a second pass over the file
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha1()
+
+    def read(self, size=-1):
+        block = self.f.read(size)
+        self.digest.update(block)
+        return block
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+def cache_dir_for(path, cache_root=None):
+    if cache_root is None:
+        cache_root = os.path.join(os.path.dirname(os.path.abspath(path)), ".cache")
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_root, name)
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != CACHE_FORMAT:
+        return None
+    return manifest
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp_path = os.path.join(cache_dir, MANIFEST + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST))
+
+
+@timed
+def to_canonical(raw):
+    # compact canonical dtypes: categorical country, datetime64 timestamp,
+    # int8 hour, float32 intensity (aggregations accumulate in float64);
+    # columns left out of a partial read (e.g. `usecols`) are skipped.
+    # Bad cells never raise: timestamps become NaT, intensities NaN and
+    # hours MISSING_HOUR, so one malformed row cannot stop a load
+    columns = {}
+    if COUNTRY in raw:
+        columns[COUNTRY] = raw[COUNTRY].astype("category")
+    if TIMESTAMP in raw:
+        columns[TIMESTAMP] = pd.to_datetime(raw[TIMESTAMP], errors="coerce")
+    if HOUR in raw:
+        hour = pd.to_numeric(raw[HOUR], errors="coerce").to_numpy(dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            valid = (hour >= 0) & (hour <= 23) & (hour == np.floor(hour))
+        columns[HOUR] = pd.Series(
+            np.where(valid, hour, MISSING_HOUR).astype(np.int8), index=raw.index
+        )
+    if INTENSITY in raw:
+        columns[INTENSITY] = pd.to_numeric(raw[INTENSITY], errors="coerce").astype(np.float32)
+    return pd.DataFrame(columns)
+
+
+def _code_dtype(n_categories):
+    return np.int16 if n_categories < np.iinfo(np.int16).max else np.int32
+
+
+def write_cache(df, cache_dir, fingerprint, sha1):
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    categories = [str(c) for c in df[COUNTRY].cat.categories]
+    columns = {
+        COUNTRY: df[COUNTRY].cat.codes.to_numpy().astype(_code_dtype(len(categories))),
+        TIMESTAMP: df[TIMESTAMP].to_numpy(dtype="datetime64[ns]"),
+        HOUR: df[HOUR].to_numpy(),
+        INTENSITY: df[INTENSITY].to_numpy(),
+    }
+    for column, file_name in COLUMN_FILES.items():
+        np.save(os.path.join(tmp_dir, file_name), columns[column])
+
+    manifest = dict(fingerprint, format=CACHE_FORMAT, sha1=sha1,
+                    rows=len(df), categories=categories)
+    _write_manifest(tmp_dir, manifest)
+
+    # the manifest is written last, so a half-built cache is never picked up
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return manifest
+
+
+def read_cache(cache_dir, manifest):
+    arrays = {
+        column: np.load(os.path.join(cache_dir, file_name), mmap_mode="r")
+        for column, file_name in COLUMN_FILES.items()
+    }
+    country = pd.Categorical.from_codes(arrays[COUNTRY], manifest["categories"])
+    return pd.DataFrame({
+        COUNTRY: country,
+        TIMESTAMP: arrays[TIMESTAMP],
+        HOUR: arrays[HOUR],
+        INTENSITY: arrays[INTENSITY],
+    }, copy=False)
+
+
+@timed
+def load_cached_csv(path, cache_root=None):
+    cache_dir = cache_dir_for(path, cache_root)
+    fingerprint = file_fingerprint(path)
+    manifest = read_manifest(cache_dir)
+
+    if manifest is not None and (
+        manifest["size"] != fingerprint["size"]
+        or manifest["mtime_ns"] != fingerprint["mtime_ns"]
+    ):
+        # size/mtime changed: only rebuild if the content really changed
+        sha1 = file_hash(path)
+        if manifest["sha1"] == sha1:
+            manifest.update(fingerprint)
+            _write_manifest(cache_dir, manifest)
+        else:
+            manifest = None
+
+    if manifest is None:
+        sha1 = file_hash(path)
+        df = to_canonical(pd.read_csv(path))
+        try:
+            manifest = write_cache(df, cache_dir, fingerprint, sha1)
+        except OSError:
+            # read-only data directory: serve the parsed frame uncached
+            df.attrs["data_version"] = sha1[:12]
+            return df
+
+    df = read_cache(cache_dir, manifest)
+    df.attrs["data_version"] = manifest["sha1"][:12]
+    return df
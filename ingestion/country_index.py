@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+
+class CountryIndex:
+    # rows sorted by (country, timestamp) plus an offset table, so every
+    # per-country slice is a contiguous view instead of a full-table scan
+
+    def __init__(self, df):
+        if not isinstance(df["country"].dtype, pd.CategoricalDtype):
+            df = df.assign(country=df["country"].astype("category"))
+        country = df["country"]
+        codes = country.cat.codes.to_numpy()
+
+        order = np.lexsort((df["timestamp"].to_numpy(), codes))
+        self.frame = df.take(order).reset_index(drop=True)
+        self.frame.attrs = dict(df.attrs)
+
+        self.countries = [str(c) for c in country.cat.categories]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.countries))
+        self.offsets = np.zeros(len(self.countries) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        # NaN countries (code -1) sort first; skip past them
+        self.offsets += int((codes < 0).sum())
+        self.positions = {c: i for i, c in enumerate(self.countries)}
+        self.data_version = df.attrs.get("data_version")
+
+    @classmethod
+    def from_sorted(cls, frame, countries, offsets):
+        # rows already in (country, timestamp) order with their offset
+        # table, e.g. memory-mapped from a published dataset; nothing is copied
+        index = cls.__new__(cls)
+        index.frame = frame
+        index.countries = [str(c) for c in countries]
+        index.offsets = np.asarray(offsets, dtype=np.int64)
+        index.positions = {c: i for i, c in enumerate(index.countries)}
+        index.data_version = frame.attrs.get("data_version")
+        return index
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __contains__(self, country):
+        return country in self.positions
+
+    def code(self, country):
+        return self.positions.get(country, -1)
+
+    def bounds(self, country):
+        code = self.code(country)
+        if code < 0:
+            return 0, 0
+        return int(self.offsets[code]), int(self.offsets[code + 1])
+
+    def slice(self, country):
+        start, stop = self.bounds(country)
+        return self.frame.iloc[start:stop]
+
+    def values(self, country, column):
+        start, stop = self.bounds(country)
+        return self.frame[column].to_numpy()[start:stop]
+
+
+def country_rows(data, country):
+    if isinstance(data, CountryIndex):
+        return data.slice(country)
+    return data[data["country"] == country]
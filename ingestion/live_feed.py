@@ -0,0 +1,245 @@
+import glob
+import io
+import os
+import queue
+import socketserver
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics.aggregates import RunningAggregates
+from analytics.trend_engine import TrendEngine
+from ingestion.column_cache import to_canonical
+from ingestion.country_index import CountryIndex
+from ingestion.validate_data import REQUIRED_COLUMNS, validate_rows
+from instrumentation.timing import timed
+from modeling.forecast import ForecastEngine
+from scheduling.policy_engine import LowHourPlan
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+POLL_INTERVAL = 1.0  # seconds
+LOW_HOUR_THRESHOLD = 200
+# readings further ahead than this of both the newest reading so far and
+# the wall clock are rejected (a bad clock or typo, e.g. year 2100)
+MAX_LEAD = np.timedelta64(7, "D")
+
+
+def _parse_lines(header, lines):
+    if not lines:
+        return None
+    return pd.read_csv(io.BytesIO(header + b"".join(lines)), dtype={"country": str})
+
+
+class FileTail:
+    # append-only CSV: each poll returns the complete lines written since the
+    # last one (a partially written last line waits for the next poll)
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.header = None
+        self.offset = None if from_start else self._size()
+
+    def _size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def poll(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            if self.header is None:
+                self.header = f.readline()
+            if self.offset is None or self._size() < self.offset:
+                # first read, or the file was truncated / replaced
+                self.offset = len(self.header)
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        return _parse_lines(self.header, data[:end].splitlines(keepends=True))
+
+
+class DirectoryTail:
+    # every CSV in a directory; files created later are read from the start
+
+    def __init__(self, directory, pattern="*.csv"):
+        self.directory = directory
+        self.pattern = pattern
+        self.tails = {path: FileTail(path) for path in self._files()}
+
+    def _files(self):
+        return sorted(glob.glob(os.path.join(self.directory, self.pattern)))
+
+    def poll(self):
+        for path in self._files():
+            if path not in self.tails:
+                self.tails[path] = FileTail(path, from_start=True)
+        frames = [frame for frame in (t.poll() for t in self.tails.values()) if frame is not None]
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.server.lines.put(line if line.endswith(b"\n") else line + b"\n")
+
+
+class SocketFeed:
+    # local stand-in for a grid-data feed: clients connect to host:port and
+    # send CSV lines in REQUIRED_COLUMNS order, without a header
+
+    def __init__(self, host="127.0.0.1", port=9009):
+        self.header = (",".join(REQUIRED_COLUMNS) + "\n").encode()
+        self.server = socketserver.ThreadingTCPServer((host, port), _LineHandler)
+        self.server.daemon_threads = True
+        self.server.lines = queue.SimpleQueue()
+        self.address = self.server.server_address
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def poll(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.server.lines.get_nowait())
+            except queue.Empty:
+                break
+        return _parse_lines(self.header, lines)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def open_source(spec):
+    # "tcp://host:port", a directory, or a CSV file
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        return SocketFeed(host or "127.0.0.1", int(port))
+    if os.path.isdir(spec):
+        return DirectoryTail(spec)
+    return FileTail(spec)
+
+
+class LiveDataset:
+    # aggregates, rolling trends, forecast and low-hour plan kept current as
+    # readings arrive; every accepted batch bumps `version`. Readers hold
+    # `lock` while they use the engines, which are updated in place.
+
+    def __init__(self, data, threshold=LOW_HOUR_THRESHOLD):
+        index = data if isinstance(data, CountryIndex) else CountryIndex(data)
+        self.threshold = threshold
+        self.base_version = index.data_version
+        self.version = 0
+        self.lock = threading.RLock()
+
+        self.running = RunningAggregates()
+        self.running.update(index.frame)
+        self.trends = TrendEngine.from_data(index)
+        self.forecast = ForecastEngine.from_data(index)
+
+        frame = index.frame
+        last = frame.groupby("country", observed=True)["timestamp"].max()
+        self.last_seen = {str(c): t.to_datetime64() for c, t in last.items()}
+
+        self.rows = 0
+        self.rejected = 0
+        self.changed = set()
+        self.updated_at = time.time()
+        self._publish()
+
+    @property
+    def data_version(self):
+        if not self.version:
+            return self.base_version
+        return f"{self.base_version}+{self.version}"
+
+    def _publish(self):
+        self.store = self.running.to_store(self.data_version)
+        self.plan = LowHourPlan.from_store(self.store, self.threshold)
+
+    def _fresh(self, rows):
+        # append-only: drop readings not newer than what a country already
+        # has, and readings too far in the future to be real
+        countries = rows["country"].astype(str).to_numpy()
+        stamps = rows["timestamp"].to_numpy()
+        floor = np.array(
+            [self.last_seen.get(c, np.datetime64("NaT")) for c in countries],
+            dtype="datetime64[ns]",
+        )
+        newest = max(self.last_seen.values(), default=np.datetime64("NaT", "ns"))
+        now = np.datetime64(int(time.time() * 1e9), "ns")
+        ceiling = now if np.isnat(newest) else max(newest, now)
+        newer = (np.isnat(floor) | (stamps > floor)) & (stamps <= ceiling + MAX_LEAD)
+        rows = rows[newer]
+        return rows[~rows.duplicated(["country", "timestamp"], keep="last")]
+
+    @timed
+    def ingest(self, raw):
+        # validates raw rows and applies the valid ones; returns rows accepted
+        if raw is None or not len(raw):
+            return 0
+        valid, rejected = validate_rows(raw)
+        rows = to_canonical(valid.sort_values("timestamp", kind="stable"))
+
+        with self.lock:
+            rows = self._fresh(rows)
+            self.rejected += rejected + (len(valid) - len(rows))
+            if not len(rows):
+                return 0
+
+            self.running.update(rows)
+            countries = rows["country"].astype(str).to_numpy()
+            self.trends.append(countries, rows[INTENSITY].to_numpy())
+            self.forecast.update(rows)
+
+            last = rows.groupby("country", observed=True)["timestamp"].max()
+            for country, stamp in last.items():
+                self.last_seen[str(country)] = stamp.to_datetime64()
+
+            self.rows += len(rows)
+            self.changed = set(countries.tolist())
+            self.version += 1
+            self.updated_at = time.time()
+            self._publish()
+        return len(rows)
+
+
+class LiveFeed:
+    # polls a source on a background thread and feeds a LiveDataset
+
+    def __init__(self, dataset, source, interval=POLL_INTERVAL):
+        self.dataset = dataset
+        self.source = source
+        self.interval = interval
+        self.errors = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if hasattr(self.source, "close"):
+            self.source.close()
+
+    def poll_once(self):
+        return self.dataset.ingest(self.source.poll())
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except (OSError, ValueError, pd.errors.ParserError) as exc:
+                # a malformed batch must not stop the feed
+                self.errors += 1
+                self.last_error = str(exc)
+            self._stop.wait(self.interval)
@@ -1,5 +1,24 @@
-import pandas as pd
-
-def load_global_data():
-    df = pd.read_csv("data/global_simulated_195_countries_30days.csv")
-    return df
+import pandas as pd
+
+from ingestion.column_cache import HashingReader, load_cached_csv, to_canonical
+from instrumentation.timing import timed
+
+DATA_PATH = "data/global_simulated_195_countries_30days.csv"
+
+
+@timed
+def load_global_data(path=DATA_PATH, use_cache=True):
+    if use_cache:
+        return load_cached_csv(path)
+    return to_canonical(pd.read_csv(path))
+
+
+def iter_global_data(path=DATA_PATH, chunksize=1_000_000, usecols=None, on_done=None):
+    # bounded-memory read: yields canonical frames of at most `chunksize` rows
+    # and passes the content hash of the whole file to `on_done` at the end
+    with open(path, "rb") as f:
+        reader = HashingReader(f)
+        for chunk in pd.read_csv(reader, chunksize=chunksize, usecols=usecols):
+            yield to_canonical(chunk)
+        if on_done is not None:
+            on_done(reader.hexdigest())
@@ -0,0 +1,99 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from instrumentation.timing import timed
+
+
+def _array_bytes(array):
+    # memory-mapped arrays live in the OS page cache, shared across processes
+    base = array
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    mapped = isinstance(array, np.memmap) or not isinstance(base, (np.ndarray, bytes))
+    return array.nbytes, mapped
+
+
+def _frame_rows(owner, prefix, frame):
+    rows = []
+    usage = frame.memory_usage(deep=True, index=True)
+    for column, nbytes in usage.items():
+        values = frame.index if column == "Index" else frame[column]
+        mapped = False
+        if column != "Index" and not isinstance(values.dtype, pd.CategoricalDtype):
+            _, mapped = _array_bytes(values.to_numpy())
+        rows.append({
+            "object": owner,
+            "component": f"{prefix}{column}",
+            "dtype": str(values.dtype),
+            "bytes": int(nbytes),
+            "mapped": mapped,
+        })
+    return rows
+
+
+def _object_rows(owner, obj, prefix="", depth=0):
+    if isinstance(obj, pd.DataFrame):
+        return _frame_rows(owner, prefix, obj)
+    if isinstance(obj, pd.Series):
+        return _frame_rows(owner, prefix, obj.to_frame())
+    if isinstance(obj, np.ndarray):
+        nbytes, mapped = _array_bytes(obj)
+        return [{
+            "object": owner,
+            "component": prefix.rstrip(".") or "array",
+            "dtype": str(obj.dtype),
+            "bytes": int(nbytes),
+            "mapped": mapped,
+        }]
+    if hasattr(obj, "__dict__") and depth == 0:
+        rows = []
+        for name, value in vars(obj).items():
+            rows.extend(_object_rows(owner, value, f"{prefix}{name}.", depth + 1))
+        return rows
+    if isinstance(obj, (list, tuple, dict, str)):
+        if isinstance(obj, dict):
+            parts = [*obj.keys(), *obj.values()]
+        elif isinstance(obj, str):
+            parts = []
+        else:
+            parts = list(obj)
+        size = sys.getsizeof(obj) + sum(sys.getsizeof(part) for part in parts)
+        return [{
+            "object": owner,
+            "component": prefix.rstrip(".") or type(obj).__name__,
+            "dtype": type(obj).__name__,
+            "bytes": size,
+            "mapped": False,
+        }]
+    return []
+
+
+@timed
+def memory_report(objects):
+    # bytes per column / attribute for each named object (DataFrames, arrays,
+    # CountryIndex, AggregateStore, ForecastEngine, ...)
+    rows = []
+    for owner, obj in objects.items():
+        rows.extend(_object_rows(owner, obj))
+    report = pd.DataFrame(rows, columns=["object", "component", "dtype", "bytes", "mapped"])
+    return report.sort_values(["object", "bytes"], ascending=[True, False], ignore_index=True)
+
+
+def memory_totals(report):
+    totals = report.groupby("object", sort=True).apply(
+        lambda rows: pd.Series({
+            "bytes": int(rows["bytes"].sum()),
+            "resident_bytes": int(rows.loc[~rows["mapped"], "bytes"].sum()),
+        }),
+        include_groups=False,
+    )
+    return totals.reset_index()
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:,.1f} {unit}" if unit != "B" else f"{n:,} B"
+        n /= 1024
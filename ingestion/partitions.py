@@ -0,0 +1,144 @@
+import argparse
+import glob
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ingestion.column_cache import load_cached_csv, to_canonical
+from instrumentation.timing import timed
+
+PARTITION_DIR = "data/partitions"
+PART_PATTERN = "part-*.csv"
+
+# partition key format and length of one partition per granularity
+FREQUENCIES = {
+    "month": ("%Y-%m", pd.DateOffset(months=1)),
+    "day": ("%Y-%m-%d", pd.DateOffset(days=1)),
+}
+
+
+def partition_keys(timestamps, freq="month"):
+    fmt, _ = FREQUENCIES[freq]
+    return pd.DatetimeIndex(timestamps).strftime(fmt)
+
+
+def partition_bounds(key):
+    # [start, end) of the period a partition directory name covers
+    _, length = FREQUENCIES["day" if len(key) == 10 else "month"]
+    start = pd.Timestamp(key)
+    return start, start + length
+
+
+def list_partitions(root=PARTITION_DIR):
+    if not os.path.isdir(root):
+        return []
+    partitions = []
+    for key in sorted(os.listdir(root)):
+        files = sorted(glob.glob(os.path.join(root, key, PART_PATTERN)))
+        if files:
+            partitions.append((key, files))
+    return partitions
+
+
+def has_partitions(root=PARTITION_DIR):
+    return bool(list_partitions(root))
+
+
+def write_partitions(df, root=PARTITION_DIR, freq="month"):
+    # new data is added as an extra part file per period; existing files
+    # (and their column caches) are never rewritten
+    df = df[df["timestamp"].notna()]
+    keys = partition_keys(df["timestamp"], freq)
+    written = []
+    for key, rows in df.groupby(keys, sort=True):
+        directory = os.path.join(root, key)
+        os.makedirs(directory, exist_ok=True)
+        part = len(glob.glob(os.path.join(directory, PART_PATTERN)))
+        path = os.path.join(directory, f"part-{part:05d}.csv")
+        rows.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M:%S")
+        written.append(path)
+    return written
+
+
+def partition_csv(source, root=PARTITION_DIR, freq="month", chunksize=1_000_000):
+    written = []
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        written.extend(write_partitions(to_canonical(chunk), root, freq))
+    return written
+
+
+@timed
+def load_partitioned(root=PARTITION_DIR, start=None, end=None, countries=None):
+    # reads only the partitions overlapping [start, end) and keeps the
+    # requested countries; each part file goes through the column cache
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+
+    frames = []
+    versions = []
+    for key, files in list_partitions(root):
+        first, last = partition_bounds(key)
+        if (start is not None and last <= start) or (end is not None and first >= end):
+            continue
+        for path in files:
+            part = load_cached_csv(path)
+            versions.append(part.attrs.get("data_version") or "")
+            keep = np.ones(len(part), dtype=bool)
+            if start is not None:
+                keep &= (part["timestamp"] >= start).to_numpy()
+            if end is not None:
+                keep &= (part["timestamp"] < end).to_numpy()
+            if countries is not None:
+                keep &= part["country"].isin(countries).to_numpy()
+            frames.append(part[keep] if not keep.all() else part)
+
+    if not frames:
+        df = to_canonical(pd.DataFrame({
+            "country": pd.Series(dtype=object),
+            "timestamp": pd.Series(dtype="datetime64[ns]"),
+            "utc_hour": pd.Series(dtype=np.int8),
+            "carbon_intensity_gCO2_per_kWh": pd.Series(dtype=np.float64),
+        }))
+    else:
+        country = union_categoricals([f["country"] for f in frames], sort_categories=True)
+        df = pd.concat(frames, ignore_index=True)
+        df["country"] = country.remove_unused_categories()
+
+    window = f"{start}|{end}|{sorted(countries) if countries is not None else ''}"
+    digest = hashlib.sha1("|".join(versions + [window]).encode()).hexdigest()
+    df.attrs["data_version"] = digest[:12]
+    return df
+
+
+@timed
+def load_window(days, root=PARTITION_DIR, end=None, countries=None):
+    # the last `days` days up to `end` (default: the newest reading)
+    if end is None:
+        partitions = list_partitions(root)
+        if not partitions:
+            return load_partitioned(root, countries=countries)
+        key, files = partitions[-1]
+        end = max(load_cached_csv(path)["timestamp"].max() for path in files)
+        end = end + pd.Timedelta(hours=1)
+    end = pd.Timestamp(end)
+    return load_partitioned(root, end - pd.Timedelta(days=days), end, countries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="split or append a dataset into time partitions")
+    parser.add_argument("source", help="CSV to add to the partitioned dataset")
+    parser.add_argument("--root", default=PARTITION_DIR)
+    parser.add_argument("--freq", choices=sorted(FREQUENCIES), default="month")
+    args = parser.parse_args()
+    for path in partition_csv(args.source, args.root, args.freq):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.aggregates import AggregateStore
+from analytics.emission_accounting import IntensityGrid
+from analytics.trend_engine import TrendEngine
+from ingestion.country_index import CountryIndex
+from ingestion.load_data import DATA_PATH, load_global_data
+from ingestion.validate_data import drop_invalid, report_path, validation_report
+from instrumentation.timing import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows: pointer updates are not serialized
+    fcntl = None
+
+# published versions live in numbered directories under SHARED_DIR; the
+# pointer file names the current one and is replaced atomically, so readers
+# see either the old version or the new one, never a partial write
+SHARED_DIR = os.path.join("data", ".shared")
+POINTER = "CURRENT.json"
+POINTER_LOCK = "CURRENT.lock"
+META = "meta.json"
+AGGREGATES = "aggregates.npz"
+KEEP_VERSIONS = 3  # older directories are removed by the next publish
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+COLUMN_FILES = {
+    "country": "country_codes.npy",
+    "timestamp": "timestamp.npy",
+    "utc_hour": "utc_hour.npy",
+    INTENSITY: "intensity.npy",
+}
+TREND_FIELDS = ("start", "capacity", "length", "cs", "csk", "cn")
+GRID_FIELDS = ("values", "mean", "cumulative")
+PARTS = ("index", "store", "trends", "grid")
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def read_pointer(root=SHARED_DIR):
+    try:
+        with open(os.path.join(root, POINTER)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# parts of a published version pickle as (root, counter, part), so a
+# process pool's initializer hands workers a reference and each worker maps
+# the same files instead of unpickling its own copy
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+def _attach_part(root, counter, part):
+    key = (os.path.abspath(root), counter)
+    with _attached_lock:
+        version = _attached.get(key)
+        if version is None:
+            version = _attached[key] = PublishedVersion(root, counter, f"v{counter:06d}")
+    return getattr(version, part)
+
+
+class _Shared:
+    shared_ref = None
+
+    def __reduce_ex__(self, protocol):
+        if self.shared_ref is None:
+            return super().__reduce_ex__(protocol)
+        return _attach_part, self.shared_ref
+
+
+class SharedIndex(_Shared, CountryIndex):
+    pass
+
+
+class SharedStore(_Shared, AggregateStore):
+    pass
+
+
+class SharedTrends(_Shared, TrendEngine):
+    pass
+
+
+class SharedGrid(_Shared, IntensityGrid):
+    pass
+
+
+class PublishedVersion:
+    # one published version, memory-mapped read-only: the sorted canonical
+    # columns behind a CountryIndex, trend prefix sums and the hourly grid
+    # are shared through the page cache; the aggregates are a few KB per
+    # country and are loaded normally
+
+    def __init__(self, root, counter, path):
+        directory = os.path.join(root, path)
+        with open(os.path.join(directory, META)) as f:
+            meta = json.load(f)
+        self.counter = counter
+        self.data_version = meta["data_version"]
+        self.validation = meta.get("validation")
+        self.published_at = meta["published_at"]
+
+        def mapped(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        frame = pd.DataFrame({
+            "country": pd.Categorical.from_codes(mapped(COLUMN_FILES["country"]), meta["countries"]),
+            **{column: mapped(name) for column, name in COLUMN_FILES.items() if column != "country"},
+        }, copy=False)
+        frame.attrs["data_version"] = self.data_version
+
+        self.index = SharedIndex.from_sorted(frame, meta["countries"], mapped("offsets.npy"))
+        self.store = SharedStore.load(os.path.join(directory, AGGREGATES))
+        self.trends = SharedTrends.from_state(
+            meta["trend_countries"], **{f: mapped(f"trend_{f}.npy") for f in TREND_FIELDS}
+        )
+        self.grid = SharedGrid.from_arrays(
+            meta["grid_countries"], meta["grid_start"],
+            **{f: mapped(f"grid_{f}.npy") for f in GRID_FIELDS},
+        )
+        for part in PARTS:
+            getattr(self, part).shared_ref = (root, counter, part)
+
+
+class SharedDataset:
+    # a reader's handle on SHARED_DIR; refresh() moves to a newer published
+    # version when the pointer's counter has changed. Callers keep the
+    # PublishedVersion refresh() returns for the length of a request, so a
+    # publish in the middle of one never mixes versions.
+
+    def __init__(self, root=SHARED_DIR):
+        self.root = root
+        self.lock = threading.Lock()
+        self.current = None
+
+    @classmethod
+    def open(cls, root=SHARED_DIR):
+        # None when nothing has been published yet
+        dataset = cls(root)
+        return dataset if dataset.refresh() is not None else None
+
+    def refresh(self):
+        pointer = read_pointer(self.root)
+        with self.lock:
+            if pointer is not None and (
+                self.current is None or pointer["counter"] != self.current.counter
+            ):
+                self.current = PublishedVersion(self.root, pointer["counter"], pointer["path"])
+            return self.current
+
+
+def current_version(root=SHARED_DIR):
+    dataset = SharedDataset.open(root)
+    if dataset is None:
+        raise FileNotFoundError(f"nothing published in {root}")
+    return dataset.current
+
+
+def _version_counters(root):
+    return [
+        int(name[1:]) for name in os.listdir(root) if name.startswith("v") and name[1:].isdigit()
+    ]
+
+
+def _claim_version(root):
+    # the next free counter, claimed by creating its directory: mkdir is
+    # atomic, so concurrent publishers always end up with different counters
+    pointer = read_pointer(root)
+    counter = max([pointer["counter"] if pointer else 0, *_version_counters(root)]) + 1
+    while True:
+        name = f"v{counter:06d}"
+        try:
+            os.mkdir(os.path.join(root, name))
+            return counter, name
+        except FileExistsError:
+            counter += 1
+
+
+@contextmanager
+def _pointer_lock(root):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, POINTER_LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _prune(root, keep_from):
+    for counter in _version_counters(root):
+        directory = os.path.join(root, f"v{counter:06d}")
+        # versions still being written (no meta yet) belong to another publisher
+        if counter < keep_from and os.path.exists(os.path.join(directory, META)):
+            # a reader still mapping these files keeps them alive (POSIX)
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+@timed
+def publish(df, root=SHARED_DIR, validation=None):
+    # builds the index, aggregates, trends and hourly grid once and writes
+    # them as the next version; returns a SharedDataset attached to it
+    index = CountryIndex(df)
+    store = AggregateStore.from_frame(index)
+    trends = TrendEngine.from_data(index)
+    grid = IntensityGrid.from_data(index)
+
+    os.makedirs(root, exist_ok=True)
+    counter, name = _claim_version(root)
+    # readers only open a version once the pointer names it, so the files
+    # are written straight into the claimed directory
+    directory = os.path.join(root, name)
+
+    frame = index.frame
+    columns = {
+        "country": frame["country"].cat.codes.to_numpy(),
+        "timestamp": frame["timestamp"].to_numpy(dtype="datetime64[ns]"),
+        "utc_hour": frame["utc_hour"].to_numpy(),
+        INTENSITY: frame[INTENSITY].to_numpy(),
+    }
+    for column, file_name in COLUMN_FILES.items():
+        np.save(os.path.join(directory, file_name), columns[column])
+    np.save(os.path.join(directory, "offsets.npy"), index.offsets)
+    store.save(os.path.join(directory, AGGREGATES))
+    for field in TREND_FIELDS:
+        np.save(os.path.join(directory, f"trend_{field}.npy"), getattr(trends, field))
+    for field in GRID_FIELDS:
+        np.save(os.path.join(directory, f"grid_{field}.npy"), getattr(grid, field))
+    _write_json(os.path.join(directory, META), {
+        "counter": counter,
+        "data_version": index.data_version,
+        "rows": len(frame),
+        "countries": index.countries,
+        "trend_countries": trends.countries,
+        "grid_countries": grid.countries,
+        "grid_start": str(grid.start),
+        "validation": validation,
+        "published_at": time.time(),
+    })
+
+    # the pointer only moves forward: a publisher that claimed an older
+    # counter but finished last leaves the newer version current
+    with _pointer_lock(root):
+        pointer = read_pointer(root)
+        if pointer is None or pointer["counter"] < counter:
+            _write_json(os.path.join(root, POINTER), {
+                "counter": counter, "path": name, "data_version": index.data_version,
+            })
+            pointer = read_pointer(root)
+        _prune(root, pointer["counter"] - KEEP_VERSIONS + 1)
+        # opened before another publisher can prune the current version
+        return SharedDataset.open(root)
+
+
+def publish_file(path=DATA_PATH, root=SHARED_DIR, force=False):
+    # validates the dataset file and publishes its valid rows, unless the
+    # current version already holds this data version
+    df = load_global_data(path)
+    pointer = read_pointer(root)
+    if not force and pointer is not None and pointer["data_version"] == df.attrs.get("data_version"):
+        return SharedDataset.open(root)
+    report = validation_report(df, report_path(path))
+    if report["invalid_rows"]:
+        df = drop_invalid(df)
+    return publish(df, root, report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="publish or inspect the shared dataset")
+    parser.add_argument("command", choices=["publish", "status"])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--root", default=SHARED_DIR)
+    parser.add_argument("--force", action="store_true",
+                        help="publish even if the data version is unchanged")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        dataset = publish_file(args.data, args.root, args.force)
+    else:
+        dataset = SharedDataset.open(args.root)
+        if dataset is None:
+            print(f"nothing published in {args.root}")
+            sys.exit(1)
+    current = dataset.current
+    print(f"version {current.counter} (data {current.data_version}), "
+          f"{len(current.index):,} rows, {len(current.store):,} countries, published "
+          f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(current.published_at))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,345 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from ingestion.column_cache import cache_dir_for
+from ingestion.load_data import DATA_PATH, iter_global_data, load_global_data
+from instrumentation.timing import timed
+
+REQUIRED_COLUMNS = ["country", "timestamp", "utc_hour", "carbon_intensity_gCO2_per_kWh"]
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+MAX_INTENSITY = 2000  # gCO2/kWh, above any real grid
+NS_PER_HOUR = 3_600_000_000_000
+
+# dtype kinds the canonical frame uses; anything else is coerced and reported
+EXPECTED_KINDS = {"timestamp": "M", "utc_hour": "iu", INTENSITY: "f"}
+
+# row-level checks; a row failing any of them is dropped by drop_invalid
+ROW_CHECKS = [
+    "missing_country", "invalid_timestamp", "missing_intensity",
+    "intensity_out_of_range", "utc_hour_mismatch",
+]
+TOP_GAPS = 10  # countries listed by missing hours in a report
+
+VALIDATION_FILE = "validation.json"
+
+
 def validate(df):
     if df.empty:
         raise ValueError("Dataset is empty")
     return True
+
+
+@timed
+def validate_rows(df):
+    # checks newly arrived raw rows; returns (valid rows, number rejected)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+
+    timestamp = pd.to_datetime(df["timestamp"], errors="coerce")
+    hour = pd.to_numeric(df["utc_hour"], errors="coerce")
+    intensity = pd.to_numeric(df["carbon_intensity_gCO2_per_kWh"], errors="coerce")
+    ok = (
+        df["country"].notna()
+        & timestamp.notna()
+        & intensity.between(0, MAX_INTENSITY)
+        & (hour == timestamp.dt.hour)
+    )
+    valid = df[ok].assign(
+        timestamp=timestamp[ok],
+        utc_hour=hour[ok],
+        carbon_intensity_gCO2_per_kWh=intensity[ok],
+    )
+    return valid, int((~ok).sum())
+
+
+def _columns(df):
+    # timestamp (ns), utc_hour and intensity as numpy arrays; canonical
+    # frames pass through without a copy, anything else is coerced
+    stamps = df["timestamp"]
+    if stamps.dtype.kind != "M":
+        stamps = pd.to_datetime(stamps, errors="coerce")
+    hour = df["utc_hour"]
+    if hour.dtype.kind not in "iuf":
+        hour = pd.to_numeric(hour, errors="coerce")
+    intensity = df[INTENSITY]
+    if intensity.dtype.kind != "f":
+        intensity = pd.to_numeric(intensity, errors="coerce")
+    return (
+        stamps.to_numpy(dtype="datetime64[ns]"),
+        hour.to_numpy(dtype=np.float64),
+        intensity.to_numpy(dtype=np.float64),
+    )
+
+
+def _problems(df, stamps, hour, intensity):
+    bad_time = np.isnat(stamps)
+    missing_intensity = np.isnan(intensity)
+    with np.errstate(invalid="ignore"):
+        out_of_range = ~missing_intensity & ((intensity < 0) | (intensity > MAX_INTENSITY))
+    hours = stamps.astype(np.int64) // NS_PER_HOUR
+    return {
+        "missing_country": df["country"].isna().to_numpy(),
+        "invalid_timestamp": bad_time,
+        "missing_intensity": missing_intensity,
+        "intensity_out_of_range": out_of_range,
+        "utc_hour_mismatch": ~bad_time & (hour != hours % 24),
+    }
+
+
+def row_problems(df):
+    # one boolean mask per row check, all from a single pass over the columns
+    return _problems(df, *_columns(df))
+
+
+def invalid_mask(df):
+    problems = row_problems(df)
+    return np.logical_or.reduce([problems[check] for check in ROW_CHECKS])
+
+
+def drop_invalid(df):
+    # rows passing every row check; keeps the frame's attrs (data version)
+    clean = df[~invalid_mask(df)].reset_index(drop=True)
+    clean.attrs = dict(df.attrs)
+    return clean
+
+
+class Validator:
+    # single-pass checks over one frame or any number of chunks: schema and
+    # dtypes, row checks, and a (countries x hours) grid of reading counts
+    # for duplicate keys and missing hours. Keys are compared at the
+    # dataset's hourly resolution; counts saturate at 255 per slot.
+
+    def __init__(self):
+        self.rows = 0
+        self.invalid_rows = 0
+        self.problems = dict.fromkeys(ROW_CHECKS, 0)
+        self.schema = []
+        self.countries = []
+        self.positions = {}
+        self.counts = np.zeros((0, 0), dtype=np.uint8)
+        self.origin = 0  # hour (since the epoch) of column 0
+        self.first = None
+        self.last = None
+
+    def _schema(self, chunk):
+        missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+        issues = [f"missing column: {c}" for c in missing]
+        for column, kinds in EXPECTED_KINDS.items():
+            if column in chunk.columns and chunk[column].dtype.kind not in kinds:
+                issues.append(f"{column}: unexpected dtype {chunk[column].dtype}")
+        for issue in issues:
+            if issue not in self.schema:
+                self.schema.append(issue)
+        return not missing
+
+    def _codes(self, country):
+        if isinstance(country.dtype, pd.CategoricalDtype):
+            local_codes, uniques = country.cat.codes.to_numpy(), country.cat.categories
+        else:
+            local_codes, uniques = pd.factorize(country.to_numpy())
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques):
+            name = str(name)
+            code = self.positions.get(name)
+            if code is None:
+                code = self.positions[name] = len(self.countries)
+                self.countries.append(name)
+            mapping[i] = code
+        return np.where(local_codes >= 0, mapping[local_codes], -1)
+
+    def _cover(self, lo, hi):
+        # grows the count grid (doubling) to every country seen and hours lo..hi
+        n_rows, width = self.counts.shape
+        start = lo if not width else min(self.origin, lo)
+        end = hi + 1 if not width else max(self.origin + width, hi + 1)
+        rows = len(self.countries)
+        if rows <= n_rows and width and start == self.origin and end - start <= width:
+            return
+        new_rows = rows if rows <= n_rows else max(rows, 2 * n_rows)
+        new_width = width if width and start == self.origin and end - start <= width \
+            else max(end - start, 2 * width)
+        origin = start if not width or start == self.origin else end - new_width
+        counts = np.zeros((new_rows, new_width), dtype=np.uint8)
+        offset = self.origin - origin
+        counts[:n_rows, offset:offset + width] = self.counts
+        self.counts, self.origin = counts, origin
+
+    @timed
+    def update(self, chunk):
+        self.rows += len(chunk)
+        if not self._schema(chunk) or not len(chunk):
+            return self
+
+        columns = _columns(chunk)
+        problems = _problems(chunk, *columns)
+        for check, mask in problems.items():
+            self.problems[check] += int(mask.sum())
+        self.invalid_rows += int(np.logical_or.reduce(list(problems.values())).sum())
+
+        codes = self._codes(chunk["country"])
+        keyed = (codes >= 0) & ~problems["invalid_timestamp"]
+        if not keyed.any():
+            return self
+        hours = columns[0][keyed].astype("datetime64[h]").astype(np.int64)
+        lo, hi = int(hours.min()), int(hours.max())
+        self.first = lo if self.first is None else min(self.first, lo)
+        self.last = hi if self.last is None else max(self.last, hi)
+        self._cover(lo, hi)
+
+        # reading counts per (country, hour) slot: a dense bincount when the
+        # chunk's slots are compact, a sort otherwise
+        flat = codes[keyed] * self.counts.shape[1] + (hours - self.origin)
+        low, high = int(flat.min()), int(flat.max())
+        if high - low < 4 * len(flat):
+            added = np.bincount(flat - low)
+            slots = np.flatnonzero(added)
+            added = added[slots]
+            slots += low
+        else:
+            slots, added = np.unique(flat, return_counts=True)
+        view = self.counts.reshape(-1)
+        view[slots] = np.minimum(view[slots].astype(np.int64) + added, 255)
+        return self
+
+    def report(self, data_version=None):
+        # compact, JSON-serializable summary of everything seen so far
+        n = len(self.countries)
+        gaps = {}
+        duplicates = missing_hours = hours = with_gaps = 0
+        if self.first is not None:
+            hours = self.last - self.first + 1
+            span = self.counts[:n, self.first - self.origin:self.last - self.origin + 1]
+            duplicates = int(span.sum(dtype=np.int64) - np.count_nonzero(span))
+            missing = hours - np.count_nonzero(span, axis=1)
+            missing_hours = int(missing.sum())
+            with_gaps = int((missing > 0).sum())
+            names = np.array(self.countries[:n], dtype=object)
+            order = np.lexsort((names, -missing))[:TOP_GAPS]
+            gaps = {self.countries[i]: int(missing[i]) for i in order if missing[i] > 0}
+
+        checks = dict(self.problems, duplicate_keys=duplicates, missing_hours=missing_hours)
+        return {
+            "data_version": data_version,
+            "ok": not self.schema and not any(checks.values()),
+            "rows": self.rows,
+            "invalid_rows": self.invalid_rows,
+            "schema": list(self.schema),
+            "checks": checks,
+            "countries": n,
+            "start": None if self.first is None else str(np.datetime64(self.first, "h")),
+            "end": None if self.last is None else str(np.datetime64(self.last, "h")),
+            "hours": hours,
+            "countries_with_gaps": with_gaps,
+            "largest_gaps": gaps,
+        }
+
+
+def _read_report(path, version):
+    try:
+        with open(path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report if report.get("data_version") == version else None
+
+
+def _write_report(path, report):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(report, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# reports by data version, for this process
+_reports = {}
+
+
+@timed
+def validation_report(df, path=None):
+    # report for a whole frame, computed once per data version: kept in
+    # memory and, when `path` is given, in a JSON file next to the data
+    version = df.attrs.get("data_version")
+    if version is not None:
+        if version in _reports:
+            return _reports[version]
+        report = _read_report(path, version) if path else None
+        if report is not None:
+            _reports[version] = report
+            return report
+    report = Validator().update(df).report(version)
+    if version is not None:
+        _reports[version] = report
+        if path:
+            _write_report(path, report)
+    return report
+
+
+def report_path(path=DATA_PATH):
+    # cached report for a dataset file, beside its column cache
+    return os.path.join(cache_dir_for(path), VALIDATION_FILE)
+
+
+def validate_dataset(path=DATA_PATH):
+    # loads through the column cache (memory-mapped when warm) and validates
+    return validation_report(load_global_data(path), report_path(path))
+
+
+@timed
+def validate_stream(path=DATA_PATH, chunksize=1_000_000):
+    # bounded-memory validation of a CSV of any size, read once
+    validator = Validator()
+    version = []
+    for chunk in iter_global_data(path, chunksize=chunksize, on_done=version.append):
+        validator.update(chunk)
+    return validator.report(version[0][:12] if version else None)
+
+
+def summarize(report):
+    # one line per problem, for logs and the CLI
+    lines = list(report["schema"])
+    for check, count in report["checks"].items():
+        if count:
+            lines.append(f"{check.replace('_', ' ')}: {count:,}")
+    if report["largest_gaps"]:
+        worst = ", ".join(f"{c} ({n:,} h)" for c, n in report["largest_gaps"].items())
+        lines.append(f"{report['countries_with_gaps']:,} countries with missing hours, e.g. {worst}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="validate an hourly carbon-intensity dataset")
+    parser.add_argument("path", nargs="?", default=DATA_PATH)
+    parser.add_argument("--stream", action="store_true",
+                        help="read the CSV in chunks instead of through the column cache")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    if args.stream:
+        report = validate_stream(args.path, args.chunksize)
+    else:
+        report = validate_dataset(args.path)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['rows']:,} rows, {report['countries']:,} countries, "
+              f"{report['start']} to {report['end']}: {'OK' if report['ok'] else 'problems found'}")
+        for line in summarize(report):
+            print(f"  {line}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
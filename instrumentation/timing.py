@@ -0,0 +1,182 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# function timing is wired in when modules are imported, so it costs nothing
+# unless GREENCODE_TIMING=1 (or the dashboard's debug mode) is set first
+ENABLED = os.environ.get("GREENCODE_TIMING", "") == "1"
+
+METRICS_DIR = os.path.join("data", ".metrics")
+TIMINGS_PATH = os.environ.get(
+    "GREENCODE_TIMINGS_PATH", os.path.join(METRICS_DIR, "timings.json")
+)
+PROFILE_DIR = os.path.join(METRICS_DIR, "profiles")
+
+# histogram bucket upper bounds: 1 us .. 100 s, 4 buckets per decade
+BUCKETS = 10.0 ** np.arange(-6, 2.01, 0.25)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = np.zeros(len(BUCKETS) + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds):
+        self.counts[np.searchsorted(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return np.nan
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        if bucket >= len(BUCKETS):
+            return self.maximum
+        return min(float(BUCKETS[bucket]), self.maximum)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "max_s": self.maximum,
+            "buckets": {f"{b:.2e}": int(n) for b, n in zip(BUCKETS, self.counts) if n},
+            "overflow": int(self.counts[-1]),
+        }
+
+
+class Registry:
+    # process-wide timings by name, shared by every session and thread
+
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+
+    def summary(self):
+        with self.lock:
+            rows = [
+                {
+                    "name": name,
+                    "count": h.count,
+                    "total_s": h.total,
+                    "mean_ms": h.total / h.count * 1000,
+                    "p50_ms": h.quantile(0.5) * 1000,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                    "p99_ms": h.quantile(0.99) * 1000,
+                    "max_ms": h.maximum * 1000,
+                }
+                for name, h in self.histograms.items()
+            ]
+        columns = ["name", "count", "total_s", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        summary = pd.DataFrame(rows, columns=columns)
+        return summary.sort_values("total_s", ascending=False, ignore_index=True)
+
+    def export(self, path=TIMINGS_PATH):
+        # current snapshot, replaced atomically so readers never see half a file
+        with self.lock:
+            snapshot = {name: h.to_dict() for name, h in self.histograms.items()}
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"time": time.time(), "pid": os.getpid(), "timings": snapshot}, f)
+            os.replace(tmp, path)
+        except OSError:
+            return None
+        return path
+
+
+REGISTRY = Registry()
+
+
+def timed(fn=None, name=None):
+    # @timed / @timed(name="...") records every call under
+    # "module.qualname"; returns fn unchanged when timing is off
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.record(label, time.perf_counter() - start)
+        return wrapper
+
+    return wrap(fn) if fn is not None else wrap
+
+
+@contextmanager
+def section(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.record(name, time.perf_counter() - start)
+
+
+class SectionTimer:
+    # consecutive sections of a script: lap(name) closes the section that
+    # started at the previous lap (or at construction)
+
+    def __init__(self, prefix="", enabled=True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        REGISTRY.record(self.prefix + name, now - self.last)
+        self.last = now
+
+
+def start_profile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, label="run", directory=PROFILE_DIR, top=30):
+    # writes <label>-<time>.prof (for snakeviz / pstats) and a text summary
+    # of the `top` entries by cumulative time; returns the .prof path
+    profiler.disable()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{label}-{stamp}-{os.getpid()}.prof")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(top)
+        with open(path[:-len(".prof")] + ".txt", "w") as f:
+            f.write(text.getvalue())
+    except OSError:
+        return None
+    return path
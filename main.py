@@ -27,30 +27,230 @@
 # print("Carbon Saved:", normal_emission - green_emission, "gCO2")
 
 
-from ingestion.load_data import load_global_data
+import argparse
+import csv
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from analytics.aggregates import load_aggregates
 from analytics.carbon_metrics import calculate_emission
 from analytics.country_analysis import average_country_intensity
+from analytics.emission_accounting import IntensityGrid
+from ingestion.load_data import DATA_PATH, load_global_data
+from ingestion.validate_data import drop_invalid, summarize, validate_dataset
 from modeling.prediction_engine import predict_low_carbon_hours
+from modeling.whatif import green_reduction
+from scheduling.placement import place_tasks, profile_horizon, read_tasks
 from scheduling.policy_engine import apply_policy
 
 ENERGY_PER_TASK = 0.5  # kWh
+TASK_HOUR = 5
+
+# below this many countries a process pool costs more than it saves
+PARALLEL_MIN_COUNTRIES = 2000
+CHUNK_SIZE = 500
+
+FIELDS = [
+    "country", "intensity", "normal_emission_g", "green_emission_g",
+    "saved_g", "low_hours", "hour", "decision",
+]
+PLACEMENT_FIELDS = [
+    "task", "placed", "country", "start", "decision", "emissions_g", "baseline_g",
+]
+PLACEMENT_HORIZON = 48  # hours of hourly profile tasks can be placed in
+
+
+def country_result(store, grid, country, energy_kwh=ENERGY_PER_TASK, hour=TASK_HOUR,
+                   threshold=200):
+    avg_intensity = average_country_intensity(store, country)
+    normal_emission = calculate_emission(avg_intensity, energy_kwh)
+
+    low_hours = predict_low_carbon_hours(store, country, threshold)
+    decision = apply_policy(hour, low_hours)
+
+    # the same simulated saving the dashboard and the bulk reports use
+    green_emission = normal_emission * (1 - green_reduction(grid, country, store.data_version))
+
+    return {
+        "country": country,
+        "intensity": round(avg_intensity, 2),
+        "normal_emission_g": round(normal_emission, 2),
+        "green_emission_g": round(green_emission, 2),
+        "saved_g": round(normal_emission - green_emission, 2),
+        "low_hours": low_hours,
+        "hour": hour,
+        "decision": decision,
+    }
+
+
+# worker processes receive the aggregates and grid once, through the initializer
+_worker_store = None
+_worker_grid = None
+
+
+def _init_worker(store, grid):
+    global _worker_store, _worker_grid
+    _worker_store, _worker_grid = store, grid
+
+
+def _results_chunk(countries, energy_kwh, hour, threshold):
+    return [country_result(_worker_store, _worker_grid, c, energy_kwh, hour, threshold)
+            for c in countries]
+
+
+def batch_results(store, grid, countries, energy_kwh=ENERGY_PER_TASK, hour=TASK_HOUR,
+                  threshold=200, workers=None):
+    # yields one result per country, in input order
+    chunks = [countries[i:i + CHUNK_SIZE] for i in range(0, len(countries), CHUNK_SIZE)]
+    if workers == 1 or (workers is None and len(countries) < PARALLEL_MIN_COUNTRIES):
+        for chunk in chunks:
+            for country in chunk:
+                yield country_result(store, grid, country, energy_kwh, hour, threshold)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(store, grid)) as pool:
+        args = [(chunk, energy_kwh, hour, threshold) for chunk in chunks]
+        for results in pool.map(_results_chunk, *zip(*args)):
+            yield from results
+
+
+def write_results(results, out, fmt="csv", fields=FIELDS):
+    # rows are written as they arrive; json output is one object per line
+    if fmt == "json":
+        for row in results:
+            out.write(json.dumps(row) + "\n")
+        return
+    writer = csv.DictWriter(out, fieldnames=fields, lineterminator="\n")
+    writer.writeheader()
+    for row in results:
+        if "low_hours" in row:
+            row = dict(row, low_hours=" ".join(map(str, row["low_hours"])))
+        writer.writerow(row)
+
+
+def check_data(path, strict=False):
+    # the report is cached per data version, so this is free on reruns
+    report = validate_dataset(path)
+    if report["ok"]:
+        return
+    print(f"data validation: {report['invalid_rows']:,} of {report['rows']:,} rows invalid",
+          file=sys.stderr)
+    for line in summarize(report):
+        print(f"  {line}", file=sys.stderr)
+    if strict:
+        sys.exit(1)
+
+
+def load_grid(path=DATA_PATH):
+    # hourly history the green-emission simulation replays, valid rows only
+    return IntensityGrid.from_data(drop_invalid(load_global_data(path)))
+
+
+def run_batch(args):
+    store = load_aggregates(args.data)
+    grid = load_grid(args.data)
+    present = [c for c, n in zip(store.countries, store.count) if n > 0]
+
+    if args.countries == ["all"]:
+        countries = present
+    else:
+        names = [c.strip() for item in args.countries for c in item.split(",") if c.strip()]
+        countries = [c for c in names if c in store and store.count[store.code(c)] > 0]
+        for missing in sorted(set(names) - set(countries)):
+            print(f"unknown country skipped: {missing}", file=sys.stderr)
+
+    results = batch_results(store, grid, countries, args.energy, args.hour, args.threshold,
+                            args.workers)
+    if args.out:
+        with open(args.out, "w", newline="") as out:
+            write_results(results, out, args.format)
+    else:
+        write_results(results, sys.stdout, args.format)
+
+
+def placement_rows(result):
+    for i, placed in enumerate(result["placed"]):
+        yield {
+            "task": i,
+            "placed": bool(placed),
+            "country": result["country"][i],
+            "start": int(result["start"][i]),
+            "decision": str(result["decision"][i]),
+            "emissions_g": round(float(result["emissions_g"][i]), 2) if placed else None,
+            "baseline_g": round(float(result["baseline_g"][i]), 2),
+        }
+
+
+def run_placement(args):
+    # places a task file on the average-day profiles: slot 0 is --hour UTC,
+    # earliest_start/deadline are hour offsets from it
+    store = load_aggregates(args.data)
+    intensity = profile_horizon(store, args.hour, PLACEMENT_HORIZON)
+    result = place_tasks(read_tasks(args.tasks), store.countries, intensity, args.capacity)
+
+    summary = result["summary"]
+    print(f"placed {summary['placed']:,} of {summary['tasks']:,} tasks in "
+          f"{summary['runtime_s']:.2f}s, saved {summary['saved_g']:,.2f} gCO2 "
+          f"({summary['saved_pct']:.2f}%)", file=sys.stderr)
+    if summary["unplaced"]:
+        print(f"{summary['unplaced']:,} tasks ({summary['unplaced_energy_kwh']:,.2f} kWh) "
+              "could not be placed", file=sys.stderr)
+    rows = placement_rows(result)
+    if args.out:
+        with open(args.out, "w", newline="") as out:
+            write_results(rows, out, args.format, PLACEMENT_FIELDS)
+    else:
+        write_results(rows, sys.stdout, args.format, PLACEMENT_FIELDS)
+
+
+def run_interactive():
+    store = load_aggregates()
+    grid = load_grid()
+
+    country = input("Enter country name: ")
+
+    result = country_result(store, grid, country)
 
-df = load_global_data()
+    print("\nCountry:", country)
+    print("Normal Emission:", result["normal_emission_g"], "gCO2")
+    print("Green Emission:", result["green_emission_g"], "gCO2")
+    print("Carbon Saved:", result["saved_g"], "gCO2")
 
-country = input("Enter country name: ")
 
-avg_intensity = average_country_intensity(df, country)
-normal_emission = calculate_emission(avg_intensity, ENERGY_PER_TASK)
+def main():
+    parser = argparse.ArgumentParser(
+        description="GreenCode emissions; interactive without --countries"
+    )
+    parser.add_argument("--countries", nargs="+",
+                        help='country names (space or comma separated) or "all"')
+    parser.add_argument("--energy", type=float, default=ENERGY_PER_TASK, help="task energy in kWh")
+    parser.add_argument("--hour", type=int, default=TASK_HOUR, help="UTC hour the task would run")
+    parser.add_argument("--threshold", type=float, default=200)
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--out", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"worker processes (default: all CPUs from "
+                             f"{PARALLEL_MIN_COUNTRIES} countries up)")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--strict", action="store_true",
+                        help="stop when the dataset fails validation")
+    parser.add_argument("--tasks",
+                        help="task CSV to place instead of per-country results (energy_kwh, "
+                             "duration, earliest_start, deadline, country, optional allowed)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="tasks that may run at once per country-hour with --tasks")
+    args = parser.parse_args()
 
-low_hours = predict_low_carbon_hours(df, country)
-decision = apply_policy(5, low_hours)
+    check_data(args.data, args.strict)
+    if args.tasks:
+        run_placement(args)
+    elif args.countries:
+        run_batch(args)
+    else:
+        run_interactive()
 
-if decision == "EXECUTE_NOW":
-    green_emission = normal_emission * 0.6
-else:
-    green_emission = normal_emission
 
-print("\nCountry:", country)
-print("Normal Emission:", round(normal_emission, 2), "gCO2")
-print("Green Emission:", round(green_emission, 2), "gCO2")
-print("Carbon Saved:", round(normal_emission - green_emission, 2), "gCO2")
+if __name__ == "__main__":
+    main()
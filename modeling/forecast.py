@@ -0,0 +1,187 @@
+import numpy as np
+import pandas as pd
+
+from ingestion.country_index import CountryIndex
+from instrumentation.timing import timed
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+HOUR = np.timedelta64(1, "h")
+MAX_UPDATE_GAP = 7 * 24  # hours a single update steps per country
+
+
+@timed
+def hourly_cube(data):
+    # (countries x days x 24) intensity grid starting at midnight of the first
+    # day; missing hours are NaN, repeated readings for an hour are averaged
+    if not isinstance(data, CountryIndex):
+        data = CountryIndex(data)
+    frame = data.frame
+    codes = frame["country"].cat.codes.to_numpy().astype(np.int64)
+    valid = (
+        (codes >= 0)
+        & frame["timestamp"].notna().to_numpy()
+        & frame[INTENSITY].notna().to_numpy()
+    )
+
+    codes = codes[valid]
+    stamps = frame["timestamp"].to_numpy()[valid].astype("datetime64[h]")
+    values = frame[INTENSITY].to_numpy(dtype=np.float64)[valid]
+
+    n = len(data.countries)
+    if not len(stamps):
+        return data.countries, np.full((n, 0, 24), np.nan), None
+    start = stamps.min().astype("datetime64[D]").astype("datetime64[h]")
+    days = int((stamps.max() - start) // np.timedelta64(24, "h")) + 1
+
+    slots = codes * days * 24 + (stamps - start).astype(np.int64)
+    sums = np.bincount(slots, weights=values, minlength=n * days * 24)
+    counts = np.bincount(slots, minlength=n * days * 24)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cube = (sums / counts).reshape(n, days, 24)
+    return data.countries, cube, start
+
+
+class ForecastEngine:
+    # seasonal 24-hour profile (EWMA across days) plus an EWMA of the recent
+    # deviation from that profile, damped over the forecast horizon; all
+    # countries are updated and forecast together. Each country keeps its own
+    # processed hour, since live feeds report per region and not in step.
+
+    def __init__(self, countries, alpha=0.2, beta=0.5, damping=0.85):
+        self.countries = [str(c) for c in countries]
+        self.positions = {c: i for i, c in enumerate(self.countries)}
+        self.alpha = alpha
+        self.beta = beta
+        self.damping = damping
+        self.profile = np.full((len(self.countries), 24), np.nan)
+        self.deviation = np.zeros(len(self.countries))
+        self.next_hour = None
+        # next hour to process, per country
+        self.country_hour = np.full(
+            len(self.countries), np.datetime64("NaT"), dtype="datetime64[h]"
+        )
+
+    @classmethod
+    @timed
+    def from_data(cls, data, **params):
+        countries, cube, start = hourly_cube(data)
+        engine = cls(countries, **params)
+        engine.fit(cube, start)
+        return engine
+
+    def fit(self, cube, start):
+        with np.errstate(all="ignore"):
+            self.profile = np.nanmean(cube, axis=1) if cube.shape[1] else self.profile
+        self.deviation = np.zeros(len(self.countries))
+        self.next_hour = start
+        if start is None:
+            return
+        flat = cube.reshape(len(self.countries), -1)
+        # stop at the last observed hour so forecasts start right after it
+        observed = np.flatnonzero(~np.isnan(flat).all(axis=0))
+        if len(observed):
+            flat = flat[:, :observed[-1] + 1]
+        codes = np.arange(len(self.countries))
+        first = int(start.astype(np.int64))
+        for t, values in enumerate(flat.T):
+            self._step(codes, values, (first + t) % 24)
+        self.next_hour = start + flat.shape[1] * HOUR
+        self.country_hour[:] = self.next_hour
+
+    def _step(self, codes, values, hour):
+        # one hour of readings (NaN: none) for the countries `codes`
+        seen = ~np.isnan(values)
+        expected = self.profile[codes, hour]
+
+        fresh = seen & np.isnan(expected)
+        self.profile[codes[fresh], hour] = values[fresh]
+        known = seen & ~fresh
+        residual = values[known] - expected[known]
+        rows = codes[known]
+        self.deviation[rows] += self.beta * (residual - self.deviation[rows])
+        self.profile[rows, hour] += self.alpha * residual
+        # hours without a reading let the deviation decay toward the profile
+        self.deviation[codes[~seen]] *= self.damping
+
+    @timed
+    def update(self, rows):
+        # incremental update from newly arrived readings (same schema as the
+        # dataset); a country's readings apply from its own last processed
+        # hour on, and at most MAX_UPDATE_GAP hours are stepped per country
+        if self.next_hour is None or not len(rows):
+            return 0
+        stamps = pd.to_datetime(rows["timestamp"]).to_numpy().astype("datetime64[h]")
+        codes = pd.Index(self.countries).get_indexer(rows["country"].to_numpy())
+        values = rows[INTENSITY].to_numpy(dtype=np.float64)
+        keep = (codes >= 0) & ~np.isnat(stamps)
+        keep[keep] = stamps[keep] >= self.country_hour[codes[keep]]
+        if not keep.any():
+            return 0
+        codes = codes[keep]
+        stamps = stamps[keep].astype(np.int64)
+        values = values[keep]
+
+        affected, inverse = np.unique(codes, return_inverse=True)
+        hi = np.full(len(affected), np.iinfo(np.int64).min)
+        np.maximum.at(hi, inverse, stamps)
+        lo = self.country_hour[affected].astype(np.int64)
+        # a long silence is skipped: its missing hours only decay the deviation
+        skip = np.maximum(hi - MAX_UPDATE_GAP + 1 - lo, 0)
+        self.deviation[affected] *= self.damping ** skip
+        lo += skip
+
+        # one cell per (country, hour) to step, in hour order
+        steps = hi - lo + 1
+        offsets = np.concatenate([[0], np.cumsum(steps)[:-1]])
+        cell_code = np.repeat(affected, steps)
+        cell_hour = np.repeat(lo, steps) + np.arange(steps.sum()) - np.repeat(offsets, steps)
+        cell_value = np.full(len(cell_code), np.nan)
+        inside = stamps >= lo[inverse]
+        at = inverse[inside]
+        cell_value[offsets[at] + stamps[inside] - lo[at]] = values[inside]
+
+        order = np.argsort(cell_hour, kind="stable")
+        hours, first = np.unique(cell_hour[order], return_index=True)
+        for hour, group in zip(hours, np.split(order, first[1:])):
+            self._step(cell_code[group], cell_value[group], int(hour % 24))
+
+        self.country_hour[affected] = (hi + 1).astype("datetime64[h]")
+        self.next_hour = max(self.next_hour, self.country_hour[affected].max())
+        return len(hours)
+
+    def forecast(self, horizon=24):
+        # (countries x horizon) intensities for the hours after the last
+        # processed hour; column k is UTC hour (next_hour + k) % 24. A country
+        # whose readings lag behind has its deviation decayed over the lag.
+        hours = self.forecast_hours(horizon)
+        lag = np.zeros(len(self.countries))
+        if self.next_hour is not None:
+            lag = np.nan_to_num((self.next_hour - self.country_hour) / HOUR)
+        decay = self.damping ** (lag[:, None] + np.arange(1, horizon + 1))
+        return self.profile[:, hours] + self.deviation[:, None] * decay
+
+    def forecast_hours(self, horizon=24):
+        start = 0 if self.next_hour is None else int(self.next_hour.astype(np.int64) % 24)
+        return (start + np.arange(horizon)) % 24
+
+    def forecast_timestamps(self, horizon=24):
+        if self.next_hour is None:
+            return None
+        return pd.DatetimeIndex(self.next_hour + np.arange(horizon) * HOUR)
+
+    def by_hour_of_day(self):
+        # next-24-hour forecast rearranged so column h is UTC hour h, the
+        # layout LowHourPlan.from_intensity expects
+        values = self.forecast(24)
+        out = np.empty_like(values)
+        out[:, self.forecast_hours(24)] = values
+        return out
+
+    def country_forecast(self, country, horizon=24):
+        code = self.positions.get(country, -1)
+        if code < 0:
+            return pd.Series(dtype=np.float64)
+        index = self.forecast_timestamps(horizon)
+        if index is None:
+            index = self.forecast_hours(horizon)
+        return pd.Series(self.forecast(horizon)[code], index=index, name=INTENSITY)
@@ -1,6 +1,24 @@
-def predict_low_carbon_hours(df, country, threshold=200):
-    subset = df[df["country"] == country]
-    low_hours = subset[
-        subset["carbon_intensity_gCO2_per_kWh"] < threshold
-    ]["utc_hour"].unique()
-    return sorted(low_hours)
+from analytics.aggregates import AggregateStore
+from ingestion.country_index import country_rows
+from instrumentation.timing import timed
+
+
+@timed
+def predict_low_carbon_hours(df, country, threshold=200):
+    if isinstance(df, AggregateStore):
+        return df.low_hours(country, threshold)
+    subset = country_rows(df, country)
+    low_hours = subset[
+        subset["carbon_intensity_gCO2_per_kWh"] < threshold
+    ]["utc_hour"].unique()
+    return sorted(low_hours)
+
+
+@timed
+def forecast_low_carbon_hours(engine, country, threshold=200, horizon=24):
+    # UTC hours in the next `horizon` hours forecast to be below threshold
+    code = engine.positions.get(country, -1)
+    if code < 0:
+        return []
+    forecast = engine.forecast(horizon)[code]
+    return sorted(set(engine.forecast_hours(horizon)[forecast < threshold].tolist()))
@@ -0,0 +1,252 @@
+import argparse
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.carbon_metrics import calculate_emission
+from analytics.emission_accounting import IntensityGrid
+from ingestion.load_data import DATA_PATH, load_global_data
+from instrumentation.timing import timed
+from modeling.window_search import window_sums
+
+ENERGY_PER_TASK = 0.5  # kWh
+LOW_HOUR_THRESHOLD = 200
+MAX_BUDGET = 6  # hours
+TASKS = 10_000  # simulated arrivals per country
+QUANTILES = (0.1, 0.5, 0.9)
+
+# how a task allowed to wait up to `budget` hours picks its start:
+#   profile   - the start whose hour of day is cheapest on an average day
+#   threshold - the first hour of day whose average is below the threshold
+#               (the GreenCode rule), else right away
+#   oracle    - the cheapest start in hindsight (upper bound on savings)
+POLICIES = ("profile", "threshold", "oracle")
+
+# the dashboard's "green emission": wait up to a day for the hour that is
+# cheapest on an average day
+GREEN_POLICY = "profile"
+GREEN_BUDGET = 23
+
+CACHE_SIZE = 64  # a 10k-task, 24-budget run is about 2 MB
+CHUNK_SIZE = 25
+# smaller sweeps run in-process; the pool only pays off on large ones
+PARALLEL_MIN_COUNTRIES = 500
+
+
+class Simulation:
+    # one country's Monte Carlo replay, per kWh: `baseline` is each task's
+    # intensity when run on arrival, `intensity[:, b]` and `delay[:, b]` its
+    # intensity and wait under the policy with a budget of b hours
+
+    def __init__(self, country, policy, baseline, intensity, delay):
+        self.country = country
+        self.policy = policy
+        self.baseline = baseline
+        self.intensity = intensity
+        self.delay = delay
+
+    @property
+    def max_budget(self):
+        return self.intensity.shape[1] - 1
+
+    def saved(self, budget, energy_kwh=ENERGY_PER_TASK):
+        # per-task gCO2 saved by waiting up to `budget` hours
+        return calculate_emission(self.baseline - self.intensity[:, budget], energy_kwh)
+
+    def reduction(self, budget):
+        # share of the run-on-arrival emissions saved across all tasks
+        total = self.baseline.sum()
+        return float((total - self.intensity[:, budget].sum()) / total) if total else 0.0
+
+    def summary(self, energy_kwh=ENERGY_PER_TASK):
+        saved = calculate_emission(self.baseline[:, None] - self.intensity, energy_kwh)
+        quantiles = np.quantile(saved, QUANTILES, axis=0)
+        total = self.baseline.sum()
+        frame = pd.DataFrame({
+            "country": self.country,
+            "policy": self.policy,
+            "budget_h": np.arange(self.max_budget + 1),
+            "emission_g": calculate_emission(self.intensity.mean(axis=0), energy_kwh),
+            "saved_g": saved.mean(axis=0),
+        })
+        for q, values in zip(QUANTILES, quantiles):
+            frame[f"saved_p{round(q * 100)}_g"] = values
+        frame["reduction_pct"] = (1 - self.intensity.sum(axis=0) / total) * 100 if total else 0.0
+        frame["delayed_pct"] = (self.delay > 0).mean(axis=0) * 100
+        frame["mean_delay_h"] = self.delay.mean(axis=0)
+        return frame
+
+
+def _day_profile(grid, code, duration):
+    # mean intensity of a `duration`-hour run starting at each hour of day,
+    # from the country's average day
+    hour_of_day = (np.arange(grid.hours) + grid.start.astype("datetime64[h]").astype(np.int64)) % 24
+    values = grid.values[code]
+    profile = np.bincount(hour_of_day, weights=values, minlength=24) / np.bincount(hour_of_day, minlength=24)
+    return profile[(np.arange(24)[:, None] + np.arange(duration)) % 24].mean(axis=1), hour_of_day
+
+
+@timed
+def simulate(grid, country, policy="profile", max_budget=MAX_BUDGET, duration=1,
+             threshold=LOW_HOUR_THRESHOLD, tasks=TASKS, seed=0):
+    # replays `tasks` random on-the-hour arrivals of a `duration`-hour job
+    # against the country's hourly history, for every budget 0..max_budget
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy: {policy}")
+    code = grid.index.get_loc(country)
+    last_start = grid.hours - duration - max_budget
+    if last_start < 0:
+        raise ValueError("history is shorter than the task duration plus the delay budget")
+
+    rng = np.random.default_rng([seed, code])
+    arrivals = rng.integers(0, last_start + 1, tasks)
+    candidates = arrivals[:, None] + np.arange(max_budget + 1)
+    actual = (window_sums(grid.values[code:code + 1], duration)[0] / duration)[candidates]
+
+    if policy == "oracle":
+        score = actual
+    else:
+        expected, hour_of_day = _day_profile(grid, code, duration)
+        expected = expected[hour_of_day[candidates]]
+        if policy == "profile":
+            score = expected
+        else:
+            # waiting k hours for a low hour scores k; if none is in reach
+            # the task runs on arrival (scored just below "unreachable")
+            waits = np.broadcast_to(np.arange(max_budget + 1, dtype=np.float64), expected.shape)
+            score = np.where(expected < threshold, waits, np.inf)
+            score[:, 0] = np.where(expected[:, 0] < threshold, 0, max_budget + 1)
+
+    # best start within each budget: running argmin, earliest start on ties
+    rows = np.arange(tasks)
+    best = np.zeros(tasks, dtype=np.int64)
+    best_score = score[:, 0].copy()
+    intensity = np.empty(actual.shape)
+    delay = np.zeros(actual.shape, dtype=np.int8)
+    intensity[:, 0] = actual[:, 0]
+    for budget in range(1, max_budget + 1):
+        better = score[:, budget] < best_score
+        best[better] = budget
+        best_score[better] = score[better, budget]
+        intensity[:, budget] = actual[rows, best]
+        delay[:, budget] = best
+    return Simulation(country, policy, actual[:, 0], intensity, delay)
+
+
+# simulations by (country, parameters, data version); the slider only
+# indexes into a cached run, so moving it never re-simulates
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def country_simulation(grid, country, version, policy="profile", max_budget=MAX_BUDGET,
+                       duration=1, threshold=LOW_HOUR_THRESHOLD, tasks=TASKS, seed=0):
+    key = (country, policy, max_budget, duration, threshold, tasks, seed, version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    simulation = simulate(grid, country, policy, max_budget, duration, threshold, tasks, seed)
+    with _cache_lock:
+        _cache[key] = simulation
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return simulation
+
+
+def green_reduction(grid, country, version):
+    # share of emissions GreenCode scheduling saves for `country`; nothing
+    # for a country without history in the grid
+    if country not in grid.index:
+        return 0.0
+    simulation = country_simulation(grid, country, version, GREEN_POLICY, GREEN_BUDGET)
+    return simulation.reduction(GREEN_BUDGET)
+
+
+# worker state, set once per process by the pool initializer
+_shared = {}
+
+
+def _init_worker(grid, params):
+    _shared.update(grid=grid, params=params)
+
+
+def _sweep_chunk(countries):
+    grid, params = _shared["grid"], dict(_shared["params"])
+    energy_kwh = params.pop("energy_kwh")
+    return [simulate(grid, country, **params).summary(energy_kwh) for country in countries]
+
+
+@timed
+def sweep(grid, countries=None, policy="profile", max_budget=MAX_BUDGET, duration=1,
+          threshold=LOW_HOUR_THRESHOLD, tasks=TASKS, seed=0,
+          energy_kwh=ENERGY_PER_TASK, workers=None):
+    # savings distribution per budget for many countries, one row per
+    # (country, budget); chunks of countries run in a process pool
+    if countries is None:
+        countries = [c for c, m in zip(grid.countries, grid.mean) if np.isfinite(m)]
+    params = dict(policy=policy, max_budget=max_budget, duration=duration, threshold=threshold,
+                  tasks=tasks, seed=seed, energy_kwh=energy_kwh)
+    chunks = [countries[i:i + CHUNK_SIZE] for i in range(0, len(countries), CHUNK_SIZE)]
+    if workers == 1 or (workers is None and len(countries) < PARALLEL_MIN_COUNTRIES):
+        _init_worker(grid, params)
+        frames = [frame for chunk in chunks for frame in _sweep_chunk(chunk)]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(grid, params)) as pool:
+            frames = [frame for result in pool.map(_sweep_chunk, chunks) for frame in result]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    # CLI only: keeps the publish stack out of the dashboard's import
+    from ingestion.shared_dataset import SHARED_DIR, current_version
+
+    parser = argparse.ArgumentParser(description="simulate delay policies against the intensity history")
+    parser.add_argument("--countries", nargs="+", default=["all"],
+                        help='country names (space or comma separated) or "all"')
+    parser.add_argument("--policy", choices=POLICIES, default="profile")
+    parser.add_argument("--max-budget", type=int, default=MAX_BUDGET, help="longest delay in hours")
+    parser.add_argument("--duration", type=int, default=1, help="task length in hours")
+    parser.add_argument("--threshold", type=float, default=LOW_HOUR_THRESHOLD)
+    parser.add_argument("--tasks", type=int, default=TASKS, help="simulated tasks per country")
+    parser.add_argument("--energy", type=float, default=ENERGY_PER_TASK, help="task energy in kWh")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", help="results CSV (default: print)")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--shared", nargs="?", const=SHARED_DIR,
+                        help="use the published shared dataset instead of --data")
+    args = parser.parse_args()
+
+    countries = None
+    if args.countries != ["all"]:
+        countries = [c.strip() for item in args.countries for c in item.split(",") if c.strip()]
+
+    if args.shared:
+        grid = current_version(args.shared).grid
+    else:
+        grid = IntensityGrid.from_data(load_global_data(args.data))
+    unknown = sorted(set(countries or []) - set(grid.countries))
+    if unknown:
+        parser.error(f"unknown countries: {', '.join(unknown)}")
+
+    results = sweep(grid, countries, args.policy, args.max_budget, args.duration,
+                    args.threshold, args.tasks, args.seed, args.energy, args.workers)
+    if args.out:
+        results.to_csv(args.out, index=False)
+    else:
+        print(results.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
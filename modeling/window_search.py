@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation.timing import timed
+
+
+def window_sums(intensity, duration):
+    # (rows x slots - duration + 1) sums of every contiguous window
+    cumulative = np.zeros((intensity.shape[0], intensity.shape[1] + 1))
+    np.cumsum(intensity, axis=1, out=cumulative[:, 1:])
+    return cumulative[:, duration:] - cumulative[:, :-duration]
+
+
+@timed
+def find_windows(intensity, duration, earliest=0, deadline=None):
+    # lowest-mean run of `duration` consecutive slots in each row of a
+    # (countries x slots) array, starting at or after `earliest` and ending
+    # by `deadline` (exclusive; default the end of the array). Windows with
+    # a missing (NaN) slot are skipped. Returns the start slot of each row
+    # (-1 where no complete window fits) and the window's mean intensity.
+    intensity = np.asarray(intensity, dtype=np.float64)
+    rows, slots = intensity.shape
+    earliest = max(int(earliest), 0)
+    deadline = slots if deadline is None else min(int(deadline), slots)
+    starts = np.full(rows, -1, dtype=np.int64)
+    means = np.full(rows, np.nan)
+    if duration < 1 or earliest + duration > deadline:
+        return starts, means
+
+    span = intensity[:, earliest:deadline]
+    missing = np.isnan(span)
+    sums = window_sums(np.where(missing, 0.0, span), duration)
+    sums[window_sums(missing, duration) > 0] = np.inf
+
+    best = sums.argmin(axis=1)
+    cost = sums[np.arange(rows), best]
+    found = np.isfinite(cost)
+    starts[found] = earliest + best[found]
+    means[found] = cost[found] / duration
+    return starts, means
+
+
+def _rows(all_countries, countries):
+    if countries is None:
+        return list(all_countries), slice(None)
+    countries = [str(c) for c in countries]
+    codes = pd.Index(all_countries).get_indexer(countries)
+    return countries, codes
+
+
+@timed
+def profile_windows(store, duration, countries=None):
+    # best time of day for a `duration`-hour job from the average hourly
+    # profile; windows may wrap past midnight UTC
+    names, rows = _rows(store.countries, countries)
+    profile = store.hourly_profile[rows]
+    if countries is not None:
+        profile = np.where((rows >= 0)[:, None], profile, np.nan)
+    hours = np.arange(24 + duration - 1) % 24
+    starts, means = find_windows(profile[:, hours], duration, deadline=24 + duration - 1)
+    found = starts >= 0
+    return pd.DataFrame({
+        "country": names,
+        "start_hour": np.where(found, starts, -1),
+        "end_hour": np.where(found, (starts + duration) % 24, -1),
+        "mean_intensity": means,
+    })
+
+
+@timed
+def forecast_windows(engine, duration, deadline=24, earliest=0, countries=None):
+    # best upcoming window from the forecast: the job starts no sooner than
+    # `earliest` hours and finishes within `deadline` hours of the next
+    # forecast hour
+    names, rows = _rows(engine.countries, countries)
+    forecast = engine.forecast(deadline)[rows]
+    if countries is not None:
+        forecast = np.where((rows >= 0)[:, None], forecast, np.nan)
+    starts, means = find_windows(forecast, duration, earliest, deadline)
+    found = starts >= 0
+    start_hour = np.full(len(starts), -1, dtype=np.int64)
+    start_hour[found] = engine.forecast_hours(deadline)[starts[found]]
+    windows = pd.DataFrame({
+        "country": names,
+        "start_offset": starts,
+        "start_hour": start_hour,
+        "end_hour": np.where(found, (start_hour + duration) % 24, -1),
+        "mean_intensity": means,
+    })
+    stamps = engine.forecast_timestamps(deadline)
+    if stamps is not None:
+        windows["start_time"] = pd.NaT
+        windows.loc[found, "start_time"] = stamps[starts[found]]
+    return windows
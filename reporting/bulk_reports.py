@@ -0,0 +1,217 @@
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.aggregates import AggregateStore
+from analytics.carbon_metrics import calculate_emission
+from analytics.emission_accounting import IntensityGrid
+from analytics.trend_engine import TrendEngine
+from ingestion.country_index import CountryIndex
+from ingestion.load_data import DATA_PATH, load_global_data
+from ingestion.shared_dataset import SHARED_DIR, current_version
+from modeling.whatif import green_reduction
+from reporting.summary_report import generate_report
+
+ENERGY_PER_TASK = 0.5  # kWh
+CARBON_PRICE_PER_KG = 1.5
+CHUNK_SIZE = 25
+REPORT_DIR = "reports"
+FORMATS = ("pdf", "csv")
+
+RECOMMENDATIONS = {
+    "High": "High carbon level. Postpone tasks.",
+    "Moderate": "Moderate level. Optimize scheduling.",
+    "Low": "Low level. Safe to execute.",
+}
+
+SUMMARY_FIELDS = [
+    "country", "rank", "n_countries", "level", "avg_intensity", "avg_7_day",
+    "avg_30_day", "best_hour", "normal_emission", "green_emission", "saved",
+    "reduction_percentage", "carbon_cost", "green_score", "recommendation",
+]
+
+
+def country_report(store, trends, grid, country, energy_kwh=ENERGY_PER_TASK):
+    # the same inputs the dashboard puts in its PDF; the best hour is the
+    # hour of day with the lowest average intensity
+    code = store.code(country)
+    avg_intensity = float(store.mean[code])
+    normal_emission = calculate_emission(avg_intensity, energy_kwh)
+    green_emission = normal_emission * (1 - green_reduction(grid, country, store.data_version))
+    if normal_emission:
+        saved, reduction_percentage = generate_report(country, normal_emission, green_emission)
+    else:
+        saved, reduction_percentage = 0.0, 0.0
+    level = store.country_level(country)
+
+    return {
+        "country": country,
+        "rank": store.rank_of(country),
+        "n_countries": int((store.count > 0).sum()),
+        "green_score": max(0, 100 - avg_intensity / 4),
+        "reduction_percentage": reduction_percentage,
+        "best_hour": int(store.hourly_profile[code].argmin()),
+        "normal_emission": normal_emission,
+        "green_emission": green_emission,
+        "saved": saved,
+        "carbon_cost": (saved / 1000) * CARBON_PRICE_PER_KG,
+        "avg_7_day": trends.window_mean(country, 7),
+        "avg_30_day": trends.window_mean(country, 30),
+        "avg_intensity": avg_intensity,
+        "level": level,
+        "recommendation": RECOMMENDATIONS[level],
+    }
+
+
+def report_csv(report):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["metric", "value"])
+    for field in SUMMARY_FIELDS:
+        writer.writerow([field, report[field]])
+    return buffer.getvalue()
+
+
+def report_filename(country, ext):
+    return re.sub(r"[^\w.-]+", "_", country).strip("_") + f"_carbon_report.{ext}"
+
+
+# worker state, set once per process by the pool initializer; the PDF
+# styles are module-level in reporting.pdf_report and built on import
+_shared = {}
+
+
+def _init_worker(store, trends, grid, energy_kwh, formats):
+    _shared.update(store=store, trends=trends, grid=grid, energy_kwh=energy_kwh, formats=formats)
+    if "pdf" in formats:
+        import reporting.pdf_report  # noqa: F401
+
+
+def _render_chunk(countries):
+    store, trends, grid = _shared["store"], _shared["trends"], _shared["grid"]
+    if "pdf" in _shared["formats"]:
+        from reporting.pdf_report import build_country_pdf
+    rendered = []
+    for country in countries:
+        report = country_report(store, trends, grid, country, _shared["energy_kwh"])
+        files = {}
+        if "pdf" in _shared["formats"]:
+            files["pdf"] = build_country_pdf(report)
+        if "csv" in _shared["formats"]:
+            files["csv"] = report_csv(report).encode()
+        rendered.append((report, files))
+    return rendered
+
+
+def render_reports(store, trends, grid, countries, energy_kwh=ENERGY_PER_TASK,
+                   formats=FORMATS, workers=None):
+    # yields (report, {format: bytes}) per country, in input order
+    chunks = [countries[i:i + CHUNK_SIZE] for i in range(0, len(countries), CHUNK_SIZE)]
+    initargs = (store, trends, grid, energy_kwh, tuple(formats))
+    if workers == 1:
+        _init_worker(*initargs)
+        for chunk in chunks:
+            yield from _render_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+        for rendered in pool.map(_render_chunk, chunks):
+            yield from rendered
+
+
+def write_reports(rendered, out_dir=REPORT_DIR, bundle=None):
+    # files go to out_dir, or into a zip bundle; summary.csv lists every report
+    summary = io.StringIO()
+    writer = csv.DictWriter(summary, fieldnames=SUMMARY_FIELDS, lineterminator="\n")
+    writer.writeheader()
+
+    archive = None
+    if bundle is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(bundle)), exist_ok=True)
+        archive = zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED)
+    else:
+        os.makedirs(out_dir, exist_ok=True)
+
+    written = 0
+    try:
+        for report, files in rendered:
+            writer.writerow({field: report[field] for field in SUMMARY_FIELDS})
+            for ext, data in files.items():
+                name = report_filename(report["country"], ext)
+                if archive is not None:
+                    archive.writestr(name, data)
+                else:
+                    with open(os.path.join(out_dir, name), "wb") as f:
+                        f.write(data)
+            written += 1
+
+        if archive is not None:
+            archive.writestr("summary.csv", summary.getvalue())
+        else:
+            with open(os.path.join(out_dir, "summary.csv"), "w", newline="") as f:
+                f.write(summary.getvalue())
+    finally:
+        if archive is not None:
+            archive.close()
+    return written
+
+
+def generate_reports(countries=None, out_dir=REPORT_DIR, bundle=None, formats=FORMATS,
+                     workers=None, energy_kwh=ENERGY_PER_TASK, path=DATA_PATH, shared=None):
+    if shared:
+        # the published version is memory-mapped, and workers map the same
+        # files instead of each unpickling a copy
+        published = current_version(shared)
+        store, trends, grid = published.store, published.trends, published.grid
+    else:
+        index = CountryIndex(load_global_data(path))
+        store = AggregateStore.from_frame(index)
+        trends = TrendEngine.from_data(index)
+        grid = IntensityGrid.from_data(index)
+
+    present = [c for c, n in zip(store.countries, store.count) if n > 0]
+    if countries is None:
+        countries = present
+    else:
+        unknown = sorted(set(countries) - set(present))
+        if unknown:
+            raise ValueError(f"unknown countries: {', '.join(unknown)}")
+
+    rendered = render_reports(store, trends, grid, list(countries), energy_kwh, formats, workers)
+    return write_reports(rendered, out_dir, bundle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build carbon reports for many countries")
+    parser.add_argument("--countries", nargs="+", default=["all"],
+                        help='country names (space or comma separated) or "all"')
+    parser.add_argument("--out", default=REPORT_DIR, help="output directory")
+    parser.add_argument("--zip", dest="bundle", help="write a zip bundle instead of a directory")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--energy", type=float, default=ENERGY_PER_TASK, help="task energy in kWh")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--shared", nargs="?", const=SHARED_DIR,
+                        help="use the published shared dataset instead of --data")
+    args = parser.parse_args()
+
+    countries = None
+    if args.countries != ["all"]:
+        countries = [c.strip() for item in args.countries for c in item.split(",") if c.strip()]
+
+    written = generate_reports(
+        countries, args.out, args.bundle, args.format, args.workers, args.energy, args.data,
+        args.shared,
+    )
+    print(f"{written} reports written to {args.bundle or args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from instrumentation.timing import timed
+
+REPORT_CACHE_SIZE = 64
+
+# built once per process and shared by every report
+STYLES = getSampleStyleSheet()
+HEADER_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.darkgreen),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("GRID", (0, 0), (-1, -1), 1, colors.black),
+    ("FONT", (0, 0), (-1, 0), "Helvetica-Bold"),
+])
+COL_WIDTHS = [200, 250]
+
+
+def _section(elements, title, rows):
+    elements.append(Paragraph(f"<b>{title}</b>", STYLES["Heading2"]))
+    elements.append(Spacer(1, 10))
+    table = Table(rows, colWidths=COL_WIDTHS)
+    table.setStyle(HEADER_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 20))
+
+
+@timed
+def build_country_pdf(report):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=40,
+        bottomMargin=40
+    )
+
+    elements = [
+        Paragraph("<b>GreenCode – Global Carbon Pollution Analysis Report</b>", STYLES["Title"]),
+        Spacer(1, 20),
+    ]
+
+    _section(elements, "1. Executive Summary", [
+        ["Metric", "Value"],
+        ["Country", report["country"]],
+        ["Global Rank", f"{report['rank']} / {report['n_countries']}"],
+        ["Green Score", f"{report['green_score']:.1f} / 100"],
+        ["Carbon Reduction (%)", f"{report['reduction_percentage']:.2f}%"],
+        [
+            "Best Execution Hour",
+            f"{int(report['best_hour'])}:00" if report["best_hour"] != "N/A" else "N/A",
+        ],
+    ])
+
+    _section(elements, "2. Carbon Emission Analysis", [
+        ["Type", "Value (gCO2)"],
+        ["Normal Execution", f"{report['normal_emission']:.2f} "],
+        ["GreenCode Execution", f"{report['green_emission']:.2f} "],
+        ["Carbon Saved", f"{report['saved']:.2f} "],
+        ["Estimated Cost Saved", f"{report['carbon_cost']:.2f}"],
+    ])
+
+    trend_status = (
+        "Increasing" if report["avg_7_day"] > report["avg_30_day"] else "Decreasing / Stable"
+    )
+    _section(elements, "3. Carbon Trend Analysis", [
+        ["Period", "Avg Carbon Intensity"],
+        ["Last 7 Days", f"{report['avg_7_day']:.2f} gCO2/kWh"],
+        ["Last 30 Days", f"{report['avg_30_day']:.2f} gCO2/kWh"],
+        ["Trend Status", trend_status],
+    ])
+
+    _section(elements, "4. Sustainability Impact", [
+        ["Indicator", "Assessment"],
+        ["Carbon Intensity", f"{report['avg_intensity']:.2f} gCO2/kWh"],
+        ["Impact Level", report["level"]],
+        ["Recommendation", report["recommendation"]],
+    ])
+    elements.pop()
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def report_key(report, data_version=None):
+    return (data_version,) + tuple(sorted(report.items()))
+
+
+def country_pdf(report, data_version=None):
+    # built on demand and kept in a bounded LRU keyed by
+    # (data version, country, report inputs)
+    key = report_key(report, data_version)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    pdf = build_country_pdf(report)
+
+    with _cache_lock:
+        _cache[key] = pdf
+        _cache.move_to_end(key)
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return pdf
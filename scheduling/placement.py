@@ -0,0 +1,285 @@
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from instrumentation.timing import timed
+from modeling.window_search import window_sums
+from scheduling.policy_engine import DECISIONS
+
+# allowed-countries value meaning "any country in the intensity matrix"
+ANY_COUNTRY = "*"
+# separator of several allowed countries in one CSV cell
+ALLOWED_SEPARATOR = ";"
+
+
+@timed
+def profile_horizon(store, start_hour=0, horizon=48):
+    # (countries x horizon) intensity from the 24-hour profiles, slot 0 being
+    # `start_hour` UTC; a forecast array can be passed to place_tasks instead
+    hours = (start_hour + np.arange(horizon)) % 24
+    return store.hourly_profile[:, hours]
+
+
+class _RangeArgmin:
+    # sparse table over window sums: argmin of any start range in O(1)
+
+    def __init__(self, values):
+        self.values = values
+        self.levels = [np.broadcast_to(np.arange(values.shape[1]), values.shape)]
+        width = 1
+        while width * 2 <= values.shape[1]:
+            prev = self.levels[-1]
+            left = prev[:, : prev.shape[1] - width]
+            right = prev[:, width:]
+            rows = np.arange(values.shape[0])[:, None]
+            self.levels.append(
+                np.where(values[rows, left] <= values[rows, right], left, right)
+            )
+            width *= 2
+
+    def query(self, rows, lo, hi):
+        k = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+        first = np.empty(len(rows), dtype=np.int64)
+        second = np.empty(len(rows), dtype=np.int64)
+        for level in np.unique(k):
+            sel = k == level
+            table = self.levels[level]
+            first[sel] = table[rows[sel], lo[sel]]
+            second[sel] = table[rows[sel], hi[sel] - (1 << level) + 1]
+        a = self.values[rows, first]
+        b = self.values[rows, second]
+        best = np.where(a <= b, first, second)
+        return best, np.minimum(a, b)
+
+
+def read_tasks(path):
+    # task CSV: allowed cells are empty, "*" or country names separated by ";"
+    tasks = pd.read_csv(path, dtype={"country": str, "allowed": object})
+    if "allowed" in tasks:
+        tasks["allowed"] = [
+            [c.strip() for c in value.split(ALLOWED_SEPARATOR) if c.strip()]
+            if isinstance(value, str) and value != ANY_COUNTRY else value
+            for value in tasks["allowed"]
+        ]
+    return tasks
+
+
+def _task_frame(tasks):
+    tasks = pd.DataFrame(tasks).reset_index(drop=True)
+    if "allowed" not in tasks:
+        tasks["allowed"] = None
+    return tasks
+
+
+def _expand_allowed(tasks, country_index, any_row):
+    # one (task, country row) pair per allowed country
+    home = country_index.get_indexer(tasks["country"])
+    if tasks["allowed"].isna().all():
+        return home, np.arange(len(tasks), dtype=np.int64), home.astype(np.int64)
+    positions = {c: i for i, c in enumerate(country_index)}
+    pair_task = []
+    pair_row = []
+    for i, (allowed, own) in enumerate(zip(tasks["allowed"], home)):
+        if isinstance(allowed, str):
+            rows = [any_row if allowed == ANY_COUNTRY else positions.get(allowed, -1)]
+        elif np.ndim(allowed) == 0 and pd.isna(allowed):
+            # None, or NaN in a column read from disk: home country only
+            rows = [own]
+        else:
+            rows = [positions.get(str(c), -1) for c in allowed]
+        pair_task.extend([i] * len(rows))
+        pair_row.extend(rows)
+    return home, np.array(pair_task, dtype=np.int64), np.array(pair_row, dtype=np.int64)
+
+
+@timed
+def place_tasks(tasks, countries, intensity, capacity=None):
+    # tasks: DataFrame/dict with energy_kwh, duration (hours), earliest_start,
+    # deadline (latest finish, exclusive) as slot offsets into `intensity`,
+    # country (home region) and optional allowed (list of countries or "*").
+    # capacity: None, an int, or a (countries x horizon) array of the number
+    # of tasks that may run concurrently in each country-hour slot.
+    started = time.perf_counter()
+    tasks = _task_frame(tasks)
+    country_index = pd.Index([str(c) for c in countries])
+    intensity = np.asarray(intensity, dtype=np.float64)
+    n_countries, horizon = intensity.shape
+    n_tasks = len(tasks)
+
+    energy = tasks["energy_kwh"].to_numpy(dtype=np.float64)
+    duration = tasks["duration"].to_numpy(dtype=np.int64)
+    earliest = tasks["earliest_start"].to_numpy(dtype=np.int64)
+    deadline = np.minimum(tasks["deadline"].to_numpy(dtype=np.int64), horizon)
+    power = energy / np.maximum(duration, 1)
+
+    home, pair_task, pair_row = _expand_allowed(tasks, country_index, n_countries)
+    valid_pair = pair_row >= 0
+
+    pair_cost = np.full(len(pair_task), np.inf)
+    pair_start = np.full(len(pair_task), -1, dtype=np.int64)
+    pair_country = np.where(pair_row == n_countries, -1, pair_row)
+    # baseline: run at earliest_start in the cheapest country it may use
+    baseline = np.full(n_tasks, np.inf)
+    windows = {}
+
+    for d in np.unique(duration):
+        if d < 1 or d > horizon:
+            continue
+        sums = window_sums(intensity, d)
+        # extra row: cheapest country for each start, used for "*" tasks
+        any_country = sums.argmin(axis=0)
+        rows = np.vstack([sums, sums[any_country, np.arange(sums.shape[1])]])
+        windows[d] = (rows, any_country)
+
+        in_d = duration == d
+        sel = np.flatnonzero(valid_pair & in_d[pair_task])
+        first = earliest[pair_task[sel]]
+        now = (first >= 0) & (first + d <= horizon)
+        np.minimum.at(baseline, pair_task[sel[now]], rows[pair_row[sel[now]], first[now]])
+
+        lo = np.maximum(earliest[pair_task[sel]], 0)
+        hi = deadline[pair_task[sel]] - d
+        ok = lo <= hi
+        sel, lo, hi = sel[ok], lo[ok], hi[ok]
+        start, cost = _RangeArgmin(rows).query(pair_row[sel], lo, hi)
+        pair_start[sel] = start
+        pair_cost[sel] = cost
+        anywhere = pair_row[sel] == n_countries
+        pair_country[sel[anywhere]] = any_country[start[anywhere]]
+
+    # best pair per task
+    best = _cheapest_pairs(pair_task, pair_cost)
+
+    chosen_country = np.full(n_tasks, -1, dtype=np.int64)
+    chosen_start = np.full(n_tasks, -1, dtype=np.int64)
+    chosen_cost = np.full(n_tasks, np.inf)
+    chosen_country[pair_task[best]] = pair_country[best]
+    chosen_start[pair_task[best]] = pair_start[best]
+    chosen_cost[pair_task[best]] = pair_cost[best]
+
+    if capacity is not None:
+        _apply_capacity(
+            capacity, intensity, windows, energy, duration, earliest, deadline,
+            pair_task, pair_row, chosen_country, chosen_start, chosen_cost,
+        )
+
+    placed = np.isfinite(chosen_cost)
+    emissions = np.where(placed, power * chosen_cost, np.nan)
+    baseline_g = np.where(np.isfinite(baseline), power * baseline, np.nan)
+    counted = placed & np.isfinite(baseline_g)
+    baseline_total = float(baseline_g[counted].sum())
+    optimized_total = float(emissions[counted].sum())
+    saved = baseline_total - optimized_total
+    # policy_engine decision codes: a task placed at its earliest start runs now
+    decision = np.where(placed & (chosen_start == earliest), 0, 1).astype(np.int8)
+
+    return {
+        "country": np.where(chosen_country >= 0, country_index.to_numpy()[chosen_country], None),
+        "start": chosen_start,
+        "decision": DECISIONS[decision],
+        "emissions_g": emissions,
+        "baseline_g": baseline_g,
+        "placed": placed,
+        "summary": {
+            "tasks": n_tasks,
+            "placed": int(placed.sum()),
+            # left out of the totals below
+            "unplaced": int((~placed).sum()),
+            "unplaced_energy_kwh": float(energy[~placed].sum()),
+            "baseline_g": baseline_total,
+            "optimized_g": optimized_total,
+            "saved_g": saved,
+            "saved_pct": saved / baseline_total * 100 if baseline_total else 0.0,
+            "runtime_s": time.perf_counter() - started,
+        },
+    }
+
+
+def _cheapest_pairs(pair_task, pair_cost):
+    # index of the cheapest pair of each task: sort by (task, cost), keep the first
+    order = np.lexsort((pair_cost, pair_task))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_task[order][1:] != pair_task[order][:-1]
+    return order[first]
+
+
+def _repropose(tasks, free, windows, duration, earliest, deadline, pair_task, pair_row,
+               chosen_country, chosen_start, chosen_cost):
+    # cheapest candidate of each task among windows with room in every hour
+    n_countries = free.shape[0]
+    wanted = np.zeros(len(duration), dtype=bool)
+    wanted[tasks] = True
+    chosen_country[tasks] = -1
+    chosen_start[tasks] = -1
+    chosen_cost[tasks] = np.inf
+
+    for d in np.unique(duration[tasks]):
+        sums = windows[d][0][:n_countries]
+        feasible = sliding_window_view(free, d, axis=1).min(axis=-1) > 0
+        masked = np.where(feasible, sums, np.inf)
+        any_country = masked.argmin(axis=0)
+        rows = np.vstack([masked, masked[any_country, np.arange(masked.shape[1])]])
+
+        sel = np.flatnonzero(wanted[pair_task] & (duration[pair_task] == d) & (pair_row >= 0))
+        lo = np.maximum(earliest[pair_task[sel]], 0)
+        hi = deadline[pair_task[sel]] - d
+        ok = lo <= hi
+        sel, lo, hi = sel[ok], lo[ok], hi[ok]
+        if not len(sel):
+            continue
+        start, cost = _RangeArgmin(rows).query(pair_row[sel], lo, hi)
+        country = np.where(pair_row[sel] == n_countries, any_country[start], pair_row[sel])
+
+        best = _cheapest_pairs(pair_task[sel], cost)
+        task = pair_task[sel][best]
+        chosen_country[task] = country[best]
+        chosen_start[task] = start[best]
+        chosen_cost[task] = cost[best]
+
+
+def _apply_capacity(capacity, intensity, windows, energy, duration, earliest,
+                    deadline, pair_task, pair_row, chosen_country, chosen_start,
+                    chosen_cost):
+    # admission in rounds: every pending task proposes its cheapest window
+    # with room left, and a proposal is admitted when, in each of its hours,
+    # it is among the largest `free` proposals for that country-hour.
+    # Uncontended tasks are all admitted in the first round; only the
+    # overflow is re-proposed against the remaining room, and the largest
+    # pending task is always admitted, so the rounds terminate.
+    n_countries, horizon = intensity.shape
+    limit = np.broadcast_to(np.asarray(capacity), (n_countries, horizon))
+    load = np.zeros(n_countries * horizon, dtype=np.int64)
+
+    order = np.argsort(-energy, kind="stable")
+    pending = order[np.isfinite(chosen_cost[order])]
+    while len(pending):
+        # one cell per (task, hour) of each proposal, tasks by priority
+        d = duration[pending]
+        offsets = np.zeros(len(pending), dtype=np.int64)
+        np.cumsum(d[:-1], out=offsets[1:])
+        cell_task = np.repeat(np.arange(len(pending)), d)
+        hour = chosen_start[pending][cell_task] + np.arange(len(cell_task)) - offsets[cell_task]
+        slot = chosen_country[pending][cell_task] * horizon + hour
+
+        # rank of each cell among the proposals for its slot
+        by_slot = np.argsort(slot, kind="stable")
+        sorted_slot = slot[by_slot]
+        group = np.ones(len(by_slot), dtype=bool)
+        group[1:] = sorted_slot[1:] != sorted_slot[:-1]
+        first = np.maximum.accumulate(np.where(group, np.arange(len(by_slot)), 0))
+        room = limit.reshape(-1)[sorted_slot] - load[sorted_slot]
+        fits = np.empty(len(by_slot), dtype=bool)
+        fits[by_slot] = np.arange(len(by_slot)) - first < room
+
+        admitted = np.logical_and.reduceat(fits, offsets)
+        load += np.bincount(slot[admitted[cell_task]], minlength=load.size)
+
+        pending = pending[~admitted]
+        if not len(pending):
+            break
+        free = limit - load.reshape(n_countries, horizon)
+        _repropose(pending, free, windows, duration, earliest, deadline, pair_task, pair_row,
+                   chosen_country, chosen_start, chosen_cost)
+        pending = pending[np.isfinite(chosen_cost[pending])]
@@ -1,4 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation.timing import timed
+
+EXECUTE_NOW = "EXECUTE_NOW"
+DELAY_TASK = "DELAY_TASK"
+
+# decision codes returned by schedule_batch
+DECISIONS = np.array([EXECUTE_NOW, DELAY_TASK])
+
+
+@timed
 def apply_policy(hour, low_hours):
     if hour in low_hours:
-        return "EXECUTE_NOW"
-    return "DELAY_TASK"
+        return EXECUTE_NOW
+    return DELAY_TASK
+
+
+class LowHourPlan:
+    # per-country low-carbon hours as a (countries x 24) boolean matrix plus
+    # the wait until the next low hour, so a whole batch is one lookup
+
+    def __init__(self, countries, mask):
+        self.countries = [str(c) for c in countries]
+        self.country_index = pd.Index(self.countries)
+        self.mask = np.asarray(mask, dtype=bool)
+
+        # 24-bit mask per country, bit h set when hour h is low-carbon
+        self.bits = (self.mask * (1 << np.arange(24))).sum(axis=1).astype(np.uint32)
+
+        # wait[c, h]: hours from h to the next low hour (cyclic), -1 if none
+        doubled = np.concatenate([self.mask, self.mask], axis=1)
+        wait = np.full(doubled.shape, -1, dtype=np.int16)
+        wait[:, 47] = np.where(doubled[:, 47], 0, -1)
+        for h in range(46, -1, -1):
+            following = wait[:, h + 1]
+            wait[:, h] = np.where(
+                doubled[:, h], 0, np.where(following >= 0, following + 1, -1)
+            )
+        self.wait = wait[:, :24]
+
+    @classmethod
+    @timed
+    def from_store(cls, store, threshold=200):
+        # same rule as predict_low_carbon_hours: any reading below threshold
+        return cls(store.countries, store.hourly_min < threshold)
+
+    @classmethod
+    def from_intensity(cls, countries, intensity, threshold=200):
+        # (countries x 24) intensities, e.g. a forecast or hourly profile
+        return cls(countries, np.asarray(intensity) < threshold)
+
+    @classmethod
+    def from_forecast(cls, engine, threshold=200):
+        # low hours taken from the next 24 forecast hours instead of history
+        return cls.from_intensity(engine.countries, engine.by_hour_of_day(), threshold)
+
+    def codes(self, countries):
+        return self.country_index.get_indexer(countries)
+
+    def low_hours(self, country):
+        code = self.country_index.get_indexer([country])[0]
+        if code < 0:
+            return []
+        return np.flatnonzero(self.mask[code]).tolist()
+
+
+@timed
+def schedule_batch(plan, countries, hours, deadlines=None):
+    # countries: names or plan codes; hours/deadlines: absolute hour offsets
+    # (hour of day is taken modulo 24). Returns (decision codes, target hours)
+    # where target is -1 for DELAY_TASK with no low hour available at all.
+    countries = np.asarray(countries)
+    if countries.dtype.kind in "OUS":
+        codes = plan.codes(countries)
+    else:
+        codes = countries.astype(np.int64)
+    hours = np.asarray(hours, dtype=np.int64)
+
+    known = codes >= 0
+    wait = np.where(known, plan.wait[np.where(known, codes, 0), hours % 24], -1)
+
+    decisions = np.where(wait == 0, 0, 1).astype(np.int8)
+    targets = np.where(wait >= 0, hours + wait, -1)
+
+    if deadlines is not None:
+        deadlines = np.asarray(deadlines, dtype=np.int64)
+        # no low hour before the deadline: run now rather than miss it
+        late = (wait != 0) & ((wait < 0) | (targets > deadlines))
+        decisions[late] = 0
+        targets = np.where(late, hours, targets)
+
+    return decisions, targets
@@ -0,0 +1,57 @@
+import http.client
+import json
+from urllib.parse import urlencode
+
+from service.query_server import DEFAULT_HOST, DEFAULT_PORT, QueryError
+
+
+class QueryClient:
+    # blocking client over one keep-alive connection to the query service
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=10):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        payload = json.loads(response.read())
+        if response.status != 200:
+            raise QueryError(response.status, payload.get("error", response.reason))
+        return payload
+
+    def get(self, query, **params):
+        params = {k: v for k, v in params.items() if v is not None}
+        return self.request("GET", f"/{query}?{urlencode(params)}")
+
+    def intensity(self, country):
+        return self.get("intensity", country=country)["intensity"]
+
+    def low_hours(self, country, threshold=None):
+        return self.get("low_hours", country=country, threshold=threshold)["low_hours"]
+
+    def decision(self, country, hour, threshold=None):
+        return self.get("decision", country=country, hour=hour, threshold=threshold)["decision"]
+
+    def emission(self, country, energy_kwh):
+        return self.get("emission", country=country, energy_kwh=energy_kwh)["emission_g"]
+
+    def batch(self, queries):
+        # queries: [{"query": "decision", "country": ..., "hour": ...}, ...];
+        # each result carries its own "status"
+        return self.request("POST", "/batch", json.dumps(queries))["results"]
+
+    def countries(self):
+        return self.request("GET", "/countries")["countries"]
+
+    def health(self):
+        return self.request("GET", "/health")
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from service.client import QueryClient
+from service.query_server import DEFAULT_HOST, DEFAULT_PORT
+
+QUERY_MIX = ("intensity", "low_hours", "decision", "emission")
+
+
+def random_query(rng, countries):
+    query = rng.choice(QUERY_MIX)
+    params = {"query": query, "country": rng.choice(countries)}
+    if query == "decision":
+        params["hour"] = rng.randrange(24)
+    elif query == "emission":
+        params["energy_kwh"] = rng.choice((0.5, 1, 5, 10))
+    return params
+
+
+def encode_request(params, host, batch=None):
+    if batch is not None:
+        body = json.dumps(batch).encode()
+        head = (
+            f"POST /batch HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        return head.encode() + body
+    params = dict(params)
+    query = params.pop("query")
+    return f"GET /{query}?{urlencode(params)} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed the connection")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def worker(host, port, requests, latencies, errors):
+    # one keep-alive connection sending pre-encoded requests back to back
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in requests:
+            start = time.perf_counter()
+            writer.write(request)
+            status = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(host, port, requests, connections):
+    latencies = []
+    errors = []
+    per_worker = [requests[i::connections] for i in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(host, port, chunk, latencies, errors) for chunk in per_worker if chunk
+    ))
+    return time.perf_counter() - start, np.array(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load test for the GreenCode query service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="queries per POST /batch request (0: one GET per query)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with QueryClient(args.host, args.port) as client:
+        countries = client.countries()
+    if not countries:
+        raise SystemExit("the service has no countries loaded")
+
+    rng = random.Random(args.seed)
+    if args.batch_size:
+        requests = [
+            encode_request(None, args.host, [
+                random_query(rng, countries) for _ in range(args.batch_size)
+            ])
+            for _ in range(-(-args.requests // args.batch_size))
+        ]
+    else:
+        requests = [
+            encode_request(random_query(rng, countries), args.host)
+            for _ in range(args.requests)
+        ]
+
+    elapsed, latencies, errors = asyncio.run(
+        run(args.host, args.port, requests, args.connections)
+    )
+    queries = len(requests) * (args.batch_size or 1)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    print(f"{len(requests):,} requests / {queries:,} queries over "
+          f"{args.connections} connections in {elapsed:.2f}s")
+    print(f"throughput: {len(requests) / elapsed:,.0f} req/s, {queries / elapsed:,.0f} queries/s")
+    print(f"latency ms: p50 {p50:.3f}  p90 {p90:.3f}  p99 {p99:.3f}  "
+          f"max {latencies.max() * 1000:.3f}")
+    if errors:
+        print(f"non-200 responses: {len(errors):,}")
+
+
+if __name__ == "__main__":
+    main()
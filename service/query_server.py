@@ -0,0 +1,315 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analytics.aggregates import load_aggregates
+from analytics.carbon_metrics import calculate_emission
+from analytics.country_analysis import average_country_intensity
+from ingestion.load_data import DATA_PATH
+from modeling.prediction_engine import predict_low_carbon_hours
+from scheduling.policy_engine import apply_policy
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+RESPONSE_CACHE_SIZE = 65536
+MAX_BATCH = 10_000
+RELOAD_INTERVAL = 30  # seconds between checks for a new data version
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _float(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise QueryError(400, f"missing parameter: {name}")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise QueryError(400, f"{name} must be a number") from None
+
+
+def _hour(params):
+    hour = _float(params, "hour")
+    if not hour.is_integer() or not 0 <= hour < 24:
+        raise QueryError(400, "hour must be an integer in 0-23")
+    return int(hour)
+
+
+class QueryService:
+    # answers queries from the in-memory aggregates; encoded responses are
+    # kept in an LRU keyed by the normalized query, so repeated lookups are
+    # a dict hit. The cache is dropped whenever the aggregates are replaced:
+    # with a `loader`, serve() reloads them when their data version changes.
+
+    def __init__(self, store, threshold=200, cache_size=RESPONSE_CACHE_SIZE, loader=None):
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.loader = loader
+        self.hits = 0
+        self.misses = 0
+        self.reload(store)
+
+    def reload(self, store):
+        self.store = store
+        self._cache = OrderedDict()
+
+    def _country(self, params):
+        country = params.get("country")
+        if not country:
+            raise QueryError(400, "missing parameter: country")
+        if not isinstance(country, str):
+            raise QueryError(400, "country must be a string")
+        code = self.store.code(country)
+        if code < 0 or self.store.count[code] == 0:
+            raise QueryError(404, f"unknown country: {country}")
+        return country
+
+    def _intensity(self, params):
+        country = self._country(params)
+        return {"country": country, "intensity": average_country_intensity(self.store, country)}
+
+    def _low_hours(self, params):
+        country = self._country(params)
+        threshold = _float(params, "threshold", self.threshold)
+        return {
+            "country": country,
+            "threshold": threshold,
+            "low_hours": predict_low_carbon_hours(self.store, country, threshold),
+        }
+
+    def _decision(self, params):
+        country = self._country(params)
+        hour = _hour(params)
+        threshold = _float(params, "threshold", self.threshold)
+        low_hours = predict_low_carbon_hours(self.store, country, threshold)
+        return {"country": country, "hour": hour, "decision": apply_policy(hour, low_hours)}
+
+    def _emission(self, params):
+        country = self._country(params)
+        energy_kwh = _float(params, "energy_kwh")
+        intensity = average_country_intensity(self.store, country)
+        return {
+            "country": country,
+            "energy_kwh": energy_kwh,
+            "emission_g": calculate_emission(intensity, energy_kwh),
+        }
+
+    QUERIES = {
+        "intensity": _intensity,
+        "low_hours": _low_hours,
+        "decision": _decision,
+        "emission": _emission,
+    }
+
+    def answer(self, query, params):
+        handler = self.QUERIES.get(query)
+        if handler is None:
+            raise QueryError(404, f"unknown query: {query}")
+        return handler(self, params)
+
+    def _cached(self, key, build):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        value = build()
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def query(self, query, params):
+        # one query -> (status, result or error dict); errors are cached too
+        if not isinstance(query, str):
+            error = "missing parameter: query" if query is None else "query must be a string"
+            return 400, {"error": error}
+        key = (query, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+        def build():
+            try:
+                return 200, self.answer(query, params)
+            except QueryError as exc:
+                return exc.status, {"error": str(exc)}
+
+        return self._cached(key, build)
+
+    def batch(self, queries):
+        if not isinstance(queries, list):
+            raise QueryError(400, "batch body must be a JSON list of queries")
+        if len(queries) > MAX_BATCH:
+            raise QueryError(400, f"at most {MAX_BATCH} queries per batch")
+        results = []
+        for item in queries:
+            if not isinstance(item, dict):
+                results.append({"status": 400, "error": "query must be an object"})
+                continue
+            params = dict(item)
+            status, result = self.query(params.pop("query", None), params)
+            results.append(dict(result, status=status))
+        return {"results": results}
+
+    def dispatch(self, method, target, body=b""):
+        # (status, encoded JSON) for one HTTP request
+        url = urlsplit(target)
+        name = url.path.strip("/")
+        try:
+            if name == "batch":
+                if method != "POST":
+                    raise QueryError(405, "use POST for /batch")
+                try:
+                    queries = json.loads(body or b"null")
+                except ValueError:
+                    raise QueryError(400, "invalid JSON body") from None
+                return 200, json.dumps(self.batch(queries)).encode()
+            if method != "GET":
+                raise QueryError(405, f"use GET for /{name}")
+            if name == "health":
+                return 200, json.dumps(self.health()).encode()
+            if name == "countries":
+                return 200, self._cached(("countries",), self._countries_body)
+            return self._cached(target, lambda: self._encode(name, dict(parse_qsl(url.query))))
+        except QueryError as exc:
+            return exc.status, json.dumps({"error": str(exc)}).encode()
+        except Exception as exc:
+            # a bug in one handler answers 500 instead of dropping the connection
+            return 500, json.dumps({"error": f"internal error: {type(exc).__name__}"}).encode()
+
+    def _encode(self, name, params):
+        try:
+            return 200, json.dumps(self.answer(name, params)).encode()
+        except QueryError as exc:
+            return exc.status, json.dumps({"error": str(exc)}).encode()
+
+    def _countries_body(self):
+        present = [c for c, n in zip(self.store.countries, self.store.count) if n > 0]
+        return json.dumps({"countries": present}).encode()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "data_version": self.store.data_version,
+            "countries": int((self.store.count > 0).sum()),
+            "cache_entries": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+        }
+
+
+def http_response(status, body, keep_alive=True):
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def handle_connection(service, reader, writer):
+    # HTTP/1.1 with keep-alive; requests on one connection are answered in order
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            method, target, version = line.decode("latin-1").split()
+            headers = {}
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", 0))
+            body = await reader.readexactly(length) if length else b""
+            keep_alive = (
+                version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            )
+            status, payload = service.dispatch(method, target, body)
+            writer.write(http_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def watch_data(service, interval=RELOAD_INTERVAL):
+    # reloads the aggregates off the event loop and swaps them in when the
+    # data version has changed
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            store = await loop.run_in_executor(None, service.loader)
+        except (OSError, ValueError):
+            continue
+        if store.data_version != service.store.data_version:
+            service.reload(store)
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None,
+                reload_interval=RELOAD_INTERVAL):
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(service, r, w), host, port
+    )
+    watcher = None
+    if service.loader is not None:
+        watcher = asyncio.create_task(watch_data(service, reload_interval))
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GreenCode JSON query service")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threshold", type=float, default=200)
+    parser.add_argument("--cache-size", type=int, default=RESPONSE_CACHE_SIZE)
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help="seconds between checks of the data file for a new version")
+    args = parser.parse_args()
+
+    def loader():
+        return load_aggregates(args.data)
+
+    service = QueryService(loader(), args.threshold, args.cache_size, loader)
+
+    def ready(server):
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"serving {len(service.store)} countries on http://{host}:{port}")
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready, args.reload_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import iter_synthetic
+from ingestion.column_cache import to_canonical
+from ingestion.live_feed import LiveDataset
+
+REGIONS = 5
+
+
+@pytest.fixture
+def live():
+    return LiveDataset(to_canonical(next(iter_synthetic(REGIONS * 24 * 10, regions=REGIONS))))
+
+
+def _raw(country, stamp, value):
+    stamp = pd.Timestamp(stamp)
+    return pd.DataFrame({
+        "country": [country],
+        "timestamp": [str(stamp)],
+        "utc_hour": [stamp.hour],
+        "carbon_intensity_gCO2_per_kWh": [value],
+    })
+
+
+def test_late_region_updates_its_forecast(live):
+    hour = live.forecast.next_hour
+    before = live.forecast.forecast()[2].copy()
+    assert live.ingest(_raw("Region00001", hour, 5.0)) == 1
+    assert live.ingest(_raw("Region00002", hour, 5.0)) == 1
+    assert live.trends.window_mean("Region00002", 1) == 5.0
+    assert not np.allclose(live.forecast.forecast()[2], before)
+
+
+def test_far_future_reading_is_rejected_quickly(live):
+    started = time.perf_counter()
+    assert live.ingest(_raw("Region00001", "2100-01-01", 100.0)) == 0
+    assert time.perf_counter() - started < 1
+    assert live.rejected == 1
+    # later real readings still reach the forecast
+    hour = live.forecast.next_hour
+    assert live.ingest(_raw("Region00001", hour, 5.0)) == 1
+    assert live.forecast.next_hour == hour + np.timedelta64(1, "h")
+
+
+def test_forecast_update_caps_long_gaps(live):
+    engine = live.forecast
+    rows = pd.DataFrame({
+        "country": ["Region00003"],
+        "timestamp": [pd.Timestamp(engine.next_hour) + pd.Timedelta(days=3650)],
+        "carbon_intensity_gCO2_per_kWh": [100.0],
+    })
+    started = time.perf_counter()
+    assert engine.update(rows) <= 7 * 24
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from analytics.aggregates import AggregateStore
+from benchmarks.synthetic import iter_synthetic, region_names
+from ingestion.column_cache import to_canonical
+from service.client import QueryClient
+from service.query_server import QueryError, QueryService, serve
+
+REGIONS = 5
+
+
+@pytest.fixture(scope="module")
+def service():
+    frame = to_canonical(next(iter_synthetic(REGIONS * 24 * 7, regions=REGIONS)))
+    return QueryService(AggregateStore.from_frame(frame))
+
+
+@pytest.fixture(scope="module")
+def port(service):
+    # serve() on an ephemeral port, in its own event loop thread
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    bound = []
+
+    def ready(server):
+        bound.append(server.sockets[0].getsockname()[1])
+        started.set()
+
+    async def run():
+        try:
+            await serve(service, port=0, ready=ready)
+        except asyncio.CancelledError:
+            pass
+
+    task = loop.create_task(run())
+    thread = threading.Thread(target=loop.run_until_complete, args=(task,), daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield bound[0]
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(10)
+    loop.close()
+
+
+@pytest.fixture
+def client(port):
+    with QueryClient(port=port) as client:
+        yield client
+
+
+def test_single_queries(client, service):
+    country = region_names(REGIONS)[0]
+    assert client.countries() == region_names(REGIONS)
+    assert client.intensity(country) == pytest.approx(service.store.mean_of(country))
+    assert client.low_hours(country, threshold=10_000) == list(range(24))
+    assert client.decision(country, 3, threshold=10_000) == "EXECUTE_NOW"
+    assert client.emission(country, 2) == pytest.approx(client.intensity(country) * 2)
+    assert client.health()["countries"] == REGIONS
+
+
+def test_single_query_errors(client):
+    with pytest.raises(QueryError) as exc:
+        client.intensity("Atlantis")
+    assert exc.value.status == 404
+    with pytest.raises(QueryError) as exc:
+        client.decision(region_names(REGIONS)[0], 24)
+    assert exc.value.status == 400
+    with pytest.raises(QueryError) as exc:
+        client.get("forecast", country=region_names(REGIONS)[0])
+    assert exc.value.status == 404
+    # the connection stays usable after errors
+    assert client.health()["status"] == "ok"
+
+
+def test_batch(client):
+    country = region_names(REGIONS)[1]
+    results = client.batch([
+        {"query": "intensity", "country": country},
+        {"query": "decision", "country": country, "hour": 5, "threshold": 10_000},
+        {"query": "intensity", "country": "Atlantis"},
+        {"query": "emission", "country": country},
+    ])
+    assert [r["status"] for r in results] == [200, 200, 404, 400]
+    assert results[0]["country"] == country
+    assert results[1]["decision"] == "EXECUTE_NOW"
+
+
+def test_batch_malformed_items(client):
+    country = region_names(REGIONS)[0]
+    results = client.batch([
+        {"query": ["intensity"], "country": country},
+        {"query": {"name": "intensity"}, "country": country},
+        {"query": "intensity", "country": [country]},
+        {"query": "low_hours", "country": {"name": country}},
+        {"country": country},
+        "intensity",
+        {"query": "intensity", "country": country},
+    ])
+    assert [r["status"] for r in results] == [400, 400, 400, 400, 400, 400, 200]
+
+
+def test_malformed_requests(client, port):
+    with pytest.raises(QueryError) as exc:
+        client.request("POST", "/batch", "{not json")
+    assert exc.value.status == 400
+    with pytest.raises(QueryError) as exc:
+        client.request("POST", "/batch", json.dumps({"query": "intensity"}))
+    assert exc.value.status == 400
+    with pytest.raises(QueryError) as exc:
+        client.request("GET", "/batch")
+    assert exc.value.status == 405
+    assert client.health()["status"] == "ok"
+
+
+def test_handler_error_is_500(service, client, monkeypatch):
+    def broken(self, params):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(QueryService.QUERIES, "broken", broken)
+    with pytest.raises(QueryError) as exc:
+        client.get("broken")
+    assert exc.value.status == 500
+    status, _ = service.dispatch("POST", "/batch", json.dumps([{"query": "broken"}]).encode())
+    assert status == 500
+    assert client.health()["status"] == "ok"
+
+
+def test_invalid_request_line_closes_connection(port):
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(b"garbage\r\n\r\n")
+        assert sock.recv(1024) == b""
+
+
+def test_reloads_when_the_data_version_changes():
+    frame = to_canonical(next(iter_synthetic(REGIONS * 24 * 7, regions=REGIONS)))
+    frame.attrs["data_version"] = "old"
+    stores = [AggregateStore.from_frame(frame)]
+    service = QueryService(stores[0], loader=lambda: stores[-1])
+    country = region_names(REGIONS)[0]
+    assert service.query("intensity", {"country": country})[0] == 200
+
+    newer = frame.assign(carbon_intensity_gCO2_per_kWh=frame["carbon_intensity_gCO2_per_kWh"] + 1)
+    newer.attrs["data_version"] = "new"
+    stores.append(AggregateStore.from_frame(newer))
+
+    async def run():
+        task = asyncio.create_task(serve(service, port=0, reload_interval=0.01))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if service.store.data_version == "new":
+                break
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert service.health()["data_version"] == "new"
+    assert service.health()["cache_entries"] == 0
+    status, result = service.query("intensity", {"country": country})
+    assert result["intensity"] == pytest.approx(stores[-1].mean_of(country))
@@ -0,0 +1,44 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import iter_synthetic
+from ingestion.column_cache import to_canonical
+from ingestion.shared_dataset import META, SharedDataset, publish, read_pointer
+
+PUBLISHERS = 4
+
+
+def _publish(root, seed):
+    df = to_canonical(next(iter_synthetic(5 * 24 * 3, regions=5, seed=seed)))
+    df.attrs["data_version"] = f"seed{seed}"
+    return publish(df, root).current.counter
+
+
+def test_concurrent_publishers_get_distinct_versions(tmp_path):
+    root = str(tmp_path / "shared")
+    with ProcessPoolExecutor(PUBLISHERS) as pool:
+        list(pool.map(_publish, [root] * PUBLISHERS, range(PUBLISHERS)))
+
+    versions = {}
+    for name in os.listdir(root):
+        if name.startswith("v"):
+            with open(os.path.join(root, name, META)) as f:
+                meta = json.load(f)
+            versions[meta["counter"]] = meta["data_version"]
+    # at least the last KEEP_VERSIONS survive, each with its own counter and data
+    assert len(versions) >= 3
+    assert len(set(versions.values())) == len(versions)
+    pointer = read_pointer(root)
+    assert pointer["counter"] == PUBLISHERS == max(versions)
+    assert pointer["data_version"] == versions[PUBLISHERS]
+
+
+def test_refresh_follows_each_publish(tmp_path):
+    root = str(tmp_path / "shared")
+    _publish(root, 0)
+    reader = SharedDataset.open(root)
+    assert reader.current.data_version == "seed0"
+    _publish(root, 1)
+    assert reader.refresh().data_version == "seed1"
+    assert reader.current.counter == 2
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.trend_engine import TrendEngine
+
+INTENSITY = "carbon_intensity_gCO2_per_kWh"
+
+
+def _frame(values_by_country):
+    rows = []
+    for country, values in values_by_country.items():
+        stamps = pd.date_range("2024-01-01", periods=len(values), freq="h")
+        rows.append(pd.DataFrame({"country": country, "timestamp": stamps, INTENSITY: values}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def _baseline_mean(df, country, n):
+    # the dashboard's original trailing mean
+    return df[df["country"] == country][INTENSITY].tail(n).mean()
+
+
+@pytest.fixture
+def readings():
+    rng = np.random.default_rng(0)
+    first_missing = rng.uniform(100, 1000, 48)
+    first_missing[0] = np.nan
+    scattered = rng.uniform(100, 1000, 200)
+    scattered[rng.choice(200, 30, replace=False)] = np.nan
+    all_missing = np.full(10, np.nan)
+    return _frame({"A": first_missing, "B": scattered, "C": all_missing})
+
+
+@pytest.mark.parametrize("n", [1, 7, 24, 30, 48, 500])
+def test_window_mean_matches_tail_mean_with_missing_readings(readings, n):
+    engine = TrendEngine.from_data(readings)
+    for country in ("A", "B"):
+        assert engine.window_mean(country, n) == pytest.approx(
+            _baseline_mean(readings, country, n), nan_ok=True
+        )
+    assert np.isnan(engine.window_mean("C", n))
+
+
+def test_trend_status_ignores_missing_readings(readings):
+    engine = TrendEngine.from_data(readings)
+    expected = _baseline_mean(readings, "A", 7) > _baseline_mean(readings, "A", 30)
+    assert engine.trend_status("A") == ("Increasing" if expected else "Decreasing")
+
+
+def test_append_matches_a_full_rebuild(readings):
+    head = readings.groupby("country").head(20)
+    tail = readings.drop(head.index)
+    engine = TrendEngine.from_data(head)
+    engine.append(tail["country"].to_numpy(), tail[INTENSITY].to_numpy())
+    full = TrendEngine.from_data(readings)
+    for country in ("A", "B"):
+        for n in (7, 30, 100):
+            assert engine.window_mean(country, n) == pytest.approx(full.window_mean(country, n))
+            assert engine.window_slope(country, n) == pytest.approx(full.window_slope(country, n))
+
+
+def test_window_slope_fits_present_readings(readings):
+    engine = TrendEngine.from_data(readings)
+    values = readings[readings["country"] == "B"][INTENSITY].tail(50).dropna().to_numpy()
+    expected = np.polyfit(np.arange(len(values)), values, 1)[0]
+    assert engine.window_slope("B", 50) == pytest.approx(expected)
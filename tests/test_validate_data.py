@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_synthetic
+from ingestion.load_data import load_global_data
+from ingestion.validate_data import drop_invalid, validate_dataset, validate_stream
+
+REGIONS = 13
+ROWS = REGIONS * 24 * 30
+
+
+@pytest.fixture
+def malformed_csv(tmp_path):
+    # one blank hour, one non-numeric intensity and one garbage timestamp
+    path = str(tmp_path / "data" / "readings.csv")
+    write_synthetic(path, ROWS, regions=REGIONS)
+    raw = pd.read_csv(path, dtype=str)
+    raw.loc[5, "utc_hour"] = ""
+    raw.loc[7, "carbon_intensity_gCO2_per_kWh"] = "n/a"
+    raw.loc[9, "timestamp"] = "not a time"
+    raw.to_csv(path, index=False)
+    return path
+
+
+def _assert_counts(report):
+    assert report["rows"] == ROWS
+    assert report["invalid_rows"] == 3
+    assert not report["ok"]
+    checks = report["checks"]
+    assert checks["utc_hour_mismatch"] == 1
+    assert checks["missing_intensity"] == 1
+    assert checks["invalid_timestamp"] == 1
+    assert checks["missing_country"] == 0
+    assert checks["intensity_out_of_range"] == 0
+    assert checks["duplicate_keys"] == 0
+    # the row with the garbage timestamp leaves its hour empty
+    assert checks["missing_hours"] == 1
+
+
+def test_validate_dataset_reports_malformed_cells(malformed_csv):
+    _assert_counts(validate_dataset(malformed_csv))
+
+
+def test_validate_stream_reports_malformed_cells(malformed_csv):
+    _assert_counts(validate_stream(malformed_csv, chunksize=1000))
+
+
+def test_drop_invalid_removes_malformed_rows(malformed_csv):
+    df = load_global_data(malformed_csv)
+    clean = drop_invalid(df)
+    assert len(clean) == ROWS - 3
+    assert clean["utc_hour"].between(0, 23).all()
+    assert clean["carbon_intensity_gCO2_per_kWh"].notna().all()
+    assert clean.attrs["data_version"] == df.attrs["data_version"]